@@ -1,131 +1,255 @@
 """
 This App is a designtool for shearwalls.
 'NOT for use in real-life, as this is NOT a full implementation'
+
+The app is split into fragments (per-wall section, per-foundation, windbeam,
+calculation and summary) working on the models in the session state.
+Every calculation step only runs when its inputs changed.
 """
 
+import io
 import streamlit as st
 import pandas as pd
 from building import building
 from building import building_plot
-from building import foundation, shearwall, windbeam, calculation
+from building import foundation, shearwall, windbeam, calculation, results, session
+from building.figures import figure_manager
+
+model = session.get_model(st.session_state)
+session.begin_run(model)
 
 st.header("Designcalculation of shearwalls.")
 st.write("NOT for use in real-life, as this is NOT a full implementation")
 
 st.sidebar.header("Building Parameters")
-bd = building.Building()
-bd.width = st.sidebar.number_input("Building Width (m)", value=50, step=1)
-bd.depth = st.sidebar.number_input("Building Depth (m)", value=15, step=1)
-bd.height = st.sidebar.number_input("Building Height (m)", value=20.0, step=0.5)
-bd.no_stories = st.sidebar.slider(
+width = st.sidebar.number_input("Building Width (m)", value=50, step=1)
+depth = st.sidebar.number_input("Building Depth (m)", value=15, step=1)
+height = st.sidebar.number_input("Building Height (m)", value=20.0, step=0.5)
+no_stories = st.sidebar.slider(
     "Number of stories: ",
     min_value=1,
-    max_value=int(bd.height / 2.5),
+    max_value=int(height / 2.5),
     value=5
 )
-bd.N_vd = st.sidebar.number_input("Building Weight N'vd (kN)", value=250000, step=1000)
-bd.pd_wind = st.sidebar.number_input("Windforce (kN/m2)", value=1.0, step=0.05)
-bd.no_shearwalls = st.sidebar.slider(
+N_vd = st.sidebar.number_input("Building Weight N'vd (kN)", value=250000, step=1000)
+pd_wind = st.sidebar.number_input("Windforce (kN/m2)", value=1.0, step=0.05)
+no_shearwalls = st.sidebar.slider(
     "Number of shearwalls: ",
     min_value=1,
     max_value=4,
     value=2
 )
+st.sidebar.write("Load combinations (factors per load case)")
+load_combos = st.sidebar.data_editor(
+    pd.DataFrame(building.default_load_combos()).transpose(),
+    num_rows="dynamic",
+    key='load_combos'
+)
+exact_buckling = st.sidebar.checkbox("Exact critical load (instead of Föppl-Dunkerley)", value=True)
 st.sidebar.write("")
 
+if session.changed(model, 'building', width, depth, height, no_stories, N_vd, pd_wind, no_shearwalls):
+    session.reset(model, building.Building(
+        width=width,
+        depth=depth,
+        height=height,
+        no_stories=no_stories,
+        N_vd=N_vd,
+        pd_wind=pd_wind,
+        no_shearwalls=no_shearwalls,
+    ))
+    model.building.initialize_data()
+bd = model.building
+bd.load_combos = building.valid_load_combos(load_combos.fillna(0.0).to_dict(orient='index'))
+if load_combos.empty:
+    st.sidebar.warning("No load combinations given, the default combinations are used.")
+bd.exact_buckling = exact_buckling
+building_key = model.keys['building']
+
+
+def rerun_dependents() -> None:
+    """
+    When a fragment changed its model on its own, rerun the app so the
+    dependent fragments (which only recompute their changed steps) follow.
+    """
+    if not model.in_app_run:
+        st.rerun()
+
+
+@st.fragment
+def wall_section(idx: int) -> None:
+    """
+    Section inputs, properties and plot of shearwall idx.
+    """
+    sw = bd.shearwalls[idx]
+    st.subheader(sw.label)
+    inputs = (
+        st.number_input("Top Flange Width (mm)", value=1400, step=50, key=f'tf_ws_sw{idx}'),
+        st.number_input("Top Flange Height (mm)", value=250, step=50, key=f'tf_h_sw{idx}'),
+        st.number_input("Web Width (mm)", value=250, step=50, key=f'web_w_sw{idx}'),
+        st.number_input("Web Height (mm)", value=5000, step=50, key=f'web_h_sw{idx}'),
+        st.number_input("Bottom Flange Width (mm)", value=1400, step=50, key=f'bf_w_sw{idx}'),
+        st.number_input("Bottom Flange Height (mm)", value=250, step=50, key=f'bf_h_sw{idx}'),
+        st.slider(
+            "Wall Position: ",
+            min_value=0.0,
+            max_value=float(bd.width),
+            value=bd.sw_insert_points[idx],
+            step=1.0,
+            key=f'pos_sw{idx}_{building_key}'
+        ),
+        st.number_input("Young's Modulus", value=10000, step=100, key=f'E_sw{idx}'),
+    )
+    if session.changed(model, f'section {idx}', building_key, inputs):
+        (sw.top_flange_width, sw.top_flange_height, sw.web_width, sw.web_height,
+         sw.bot_flange_width, sw.bot_flange_height, sw.insert_point, sw.E_wall) = inputs
+        sw = building.calculate_section(sw)
+        sw = shearwall.plot_section(sw)
+        sw = building.calc_geom_data(sw)
+        rerun_dependents()
+
+    st.plotly_chart(sw.plot_section, use_container_width=True)
+
+    st.write(f'$A     $= {sw.A:.0f} $mm^2$')
+    st.write(f'$I_y   $= {sw.Iy:.4e} $mm^4$')
+    st.write(f'$E_c   $= {sw.E_wall:.0f} $MPa$')
+
+
+@st.fragment
+def pile_foundation(idx: int) -> None:
+    """
+    Pile foundation inputs, stiffness and plot of shearwall idx.
+    """
+    sw = bd.shearwalls[idx]
+    st.subheader(sw.label)
+
+    fd = sw.foundation
+    inputs = (
+        st.number_input("Pile Stiffness (kN/m)", value=100000, step=500, key=f'p_stiff_sw{idx}'),
+        st.number_input("Pile Size (mm)", value=300, step=25, key=f'p_size_sw{idx}'),
+        st.number_input("Pile Grid X (mm)", value=1500, step=50, key=f'grid_x_sw{idx}'),
+        st.number_input("Pile Grid Y (mm)", value=1500, step=50, key=f'grid_y_sw{idx}'),
+        st.number_input("Piles in X-direction", value=2, step=1, key=f'p_no_x_sw{idx}'),
+        st.number_input("Piles in Y-direction", value=4, step=1, key=f'p_no_y_sw{idx}'),
+    )
+    if session.changed(model, f'foundation {idx}', building_key, inputs):
+        (fd.pile_stiffness, fd.pile_size, fd.pile_grid_x, fd.pile_grid_y,
+         fd.pile_no_x, fd.pile_no_y) = inputs
+        fd = foundation.calculate_foundation(fd)
+        fd = foundation.plot_foundation(fd)
+        rerun_dependents()
+
+    st.plotly_chart(fd.plot_foundation, use_container_width=True)
+
+    st.write(f'$C_r     $= {fd.foundation_stiffness:.4e} $kNm/rad$')
+
+
+@st.fragment
+def plot_building() -> None:
+    """
+    3d plot of the building, rebuilding only the traces of changed items.
+    """
+    building_fig = building_plot.update_building_figure(bd, st.session_state.get('building_fig'))
+    st.session_state['building_fig'] = building_fig
+    st.plotly_chart(building_fig.fig, use_container_width=True)
+    st.caption(
+        f'{building_fig.traces_updated} of {len(building_fig.fig.data)} traces rebuilt '
+        f'({building_fig.bytes_updated / 1000:.1f} kB); the full figure '
+        f'({building_fig.bytes_figure / 1000:.1f} kB) is sent on every rerun'
+    )
+
+
+@st.fragment
+def windbeam_results() -> None:
+    """
+    Windbeam reactions, envelope and plots.
+    """
+    st.subheader('WINDBEAM')
+    st.write(f'UDL_floor = {bd.pd_wind} * ({bd.height} / {bd.no_stories}) = {bd.pd_wind * (bd.height / bd.no_stories)} kN/m1')
+    for idx in range(len(bd.shearwall_labels)):
+        st.write(f'Support {idx + 1}: {bd.floor_reactions[idx]:.2f} kN ({bd.shearwalls[idx].windshare * 100:.2f}%)')
+    env = bd.floor_envelope
+    st.write(f"My: max {env['My_max']:.2f} kNm ({env['My_max_combo']}), min {env['My_min']:.2f} kNm ({env['My_min_combo']})")
+    st.write(f"Vz: max {env['Vz_max']:.2f} kN ({env['Vz_max_combo']}), min {env['Vz_min']:.2f} kN ({env['Vz_min_combo']})")
+    st.table(pd.DataFrame(
+        bd.floor_combo_reactions, index=list(bd.load_combos), columns=bd.shearwall_labels
+    ).round(2))
+    st.image(bd.floor_plot_My)
+    st.image(bd.floor_plot_Vz)
+
+
+@st.fragment
+def wall_calculation(idx: int) -> None:
+    """
+    Handcalculation and pile forces of shearwall idx.
+    """
+    sw = bd.shearwalls[idx]
+    st.header(sw.label)
+    fd = sw.foundation
+    inputs = (
+        building_key, bd.load_combos, bd.exact_buckling, sw.windshares, sw.E_wall, sw.Iy, fd.foundation_stiffness,
+        fd.pile_grid_x, fd.pile_grid_y, fd.pile_no_x, fd.pile_no_y,
+    )
+    if session.changed(model, f'calculation {idx}', inputs):
+        sw = calculation.sw_calculation(sw, bd)
+        sw.foundation = foundation.plot_pile_forces(sw.foundation)
+    calculation.display_sw_calculation(sw)
+    st.plotly_chart(sw.foundation.plot_pile_forces, use_container_width=True)
+
+
+@st.fragment
+def summary() -> None:
+    """
+    Summary table of the results of all shearwalls.
+    """
+    st.subheader('SUMMARY')
+    if session.changed(model, 'summary', [sw.results for sw in bd.shearwalls]):
+        table = results.results_table(bd.shearwalls)
+        st.session_state['summary'] = results.format_table(table)
+        buffer = io.BytesIO()
+        results.write_results(table, buffer)
+        st.session_state['summary_parquet'] = buffer.getvalue()
+    st.table(st.session_state['summary'])
+    st.download_button(
+        "Download results (Parquet)", st.session_state['summary_parquet'],
+        file_name='results.parquet', mime='application/octet-stream',
+    )
 
-bd.initialize_data()
 
 with st.expander('WALL SECTION', expanded=False):
     for idx, tab in enumerate(st.tabs(bd.shearwall_labels)):
-        
         with tab:
-            sw = bd.shearwalls[idx]
-            st.subheader(sw.label)
-            sw.top_flange_width = tab.number_input("Top Flange Width (mm)", value=1400, step=50, key=f'tf_ws_sw{idx}')
-            sw.top_flange_height = tab.number_input("Top Flange Height (mm)", value=250, step=50, key=f'tf_h_sw{idx}')
-            sw.web_width = tab.number_input("Web Width (mm)", value=250, step=50, key=f'web_w_sw{idx}')
-            sw.web_height = tab.number_input("Web Height (mm)", value=5000, step=50, key=f'web_h_sw{idx}')
-            sw.bot_flange_width = tab.number_input("Bottom Flange Width (mm)", value=1400, step=50, key=f'bf_w_sw{idx}')
-            sw.bot_flange_height = tab.number_input("Bottom Flange Height (mm)", value=250, step=50, key=f'bf_h_sw{idx}')
-            sw.insert_point = st.slider(
-                "Wall Position: ",
-                min_value=0.0,
-                max_value=float(bd.width),
-                value=sw.insert_point,
-                step=1.0
-            )
-            sw.E_wall = tab.number_input("Young's Modulus", value=10000, step=100, key=f'E_sw{idx}')
-
-            sw = building.calculate_section(sw)
-            sw = shearwall.plot_section(sw)
-            bd = windbeam.floor(bd)
-            st.plotly_chart(bd.shearwalls[idx].plot_section, use_container_width=True)
-
-            st.write(f'$A     $= {sw.A:.0f} $mm^2$')
-            st.write(f'$I_y   $= {sw.Iy:.4e} $mm^4$')
-            st.write(f'$E_c   $= {sw.E_wall:.0f} $MPa$')
+            wall_section(idx)
 
 with st.expander('PILE FOUNDATION', expanded=False):
     for idx, tab in enumerate(st.tabs(bd.shearwall_labels)):
-        
         with tab:
-            sw = bd.shearwalls[idx]
-            st.subheader(sw.label)
-
-            fd = sw.foundation
-            fd.pile_stiffness = tab.number_input("Pile Stiffness (kN/m)", value=100000, step=500, key=f'p_stiff_sw{idx}')
-            fd.pile_size = tab.number_input("Pile Size (mm)", value=300, step=25, key=f'p_size_sw{idx}')
-            fd.pile_grid_x = tab.number_input("Pile Grid X (mm)", value=1500, step=50, key=f'grid_x_sw{idx}')
-            fd.pile_grid_y = tab.number_input("Pile Grid Y (mm)", value=1500, step=50, key=f'grid_y_sw{idx}')
-            fd.pile_no_x = tab.number_input("Piles in X-direction", value=2, step=1, key=f'p_no_x_sw{idx}')
-            fd.pile_no_y = tab.number_input("Piles in Y-direction", value=4, step=1, key=f'p_no_y_sw{idx}')
-
-            fd = foundation.calculate_foundation(fd)
-            fd = foundation.plot_foundation(fd)
-            
-            st.plotly_chart(fd.plot_foundation, use_container_width=True)
+            pile_foundation(idx)
 
-            st.write(f'$C_r     $= {fd.foundation_stiffness:.4e} $kNm/rad$')
-
-for idx, sw in enumerate(bd.shearwalls):
-    bd.shearwalls[idx] = building.calc_geom_data(sw)
-
-fig = building_plot.plot_building(bd)
 with st.expander('PLOT BUILDING', expanded=True):
-    st.plotly_chart(fig, use_container_width=True)
+    plot_building()
 
-bd = windbeam.floor(bd)
+insert_points = [sw.insert_point for sw in bd.shearwalls]
+if session.changed(model, 'windbeam', building_key, insert_points, bd.load_combos):
+    bd = windbeam.floor(bd)
 
 with st.expander('WINDBEAM', expanded=False):
-    st.subheader('WINDBEAM')
-    st.write(f'UDL_floor = {bd.pd_wind} * ({bd.height} / {bd.no_stories}) = {bd.pd_wind * (bd.height / bd.no_stories)} kN/m1')
-    for idx in range(len(bd.shearwall_labels)):
-        st.write(f'Support {idx + 1}: {bd.floor_reactions[idx]:.2f} kN ({bd.shearwalls[idx].windshare * 100:.2f}%)')
-    st.pyplot(fig=bd.floor_plot_My)
-    st.pyplot(fig=bd.floor_plot_Vz)
+    windbeam_results()
 
 with st.expander('CALCULATION', expanded=False):
     st.subheader('Handcalculation')
     for idx, tab in enumerate(st.tabs(bd.shearwall_labels)):
-        
         with tab:
-            sw = bd.shearwalls[idx]
-            st.header(sw.label)
-            sw = calculation.sw_calculation(sw, bd)
-            calculation.display_sw_calculation(sw)   
+            wall_calculation(idx)
 
 with st.expander('SUMMARY', expanded=False):
-    st.subheader('SUMMARY')
-    cols = list(bd.shearwalls[0].results.keys())
-    results = []
-    for idx in range(len(bd.shearwall_labels)):
-        results.append(list(bd.shearwalls[idx].results.values()))
-    df = pd.DataFrame(results, columns=cols, index = bd.shearwall_labels).transpose()
-    st.table(df)
-
-
-
-
-
-
+    summary()
+
+session.end_run(model)
+st.caption(f"Rerun {model.rerun_ms:.0f} ms, recomputed: {', '.join(model.recomputed) or 'nothing'}")
+metrics = figure_manager.metrics()
+st.caption(
+    f"Memory {metrics['rss_bytes'] / 2**20:.0f} MB, "
+    f"figures {metrics['live_figures']} (pyplot {metrics['pyplot_figures']}), "
+    f"plot cache {metrics['cache_entries']} images / {metrics['cache_bytes'] / 2**20:.1f} MB"
+)
@@ -0,0 +1,286 @@
+"""
+A module with a differential accuracy harness for the fast solvers.
+
+Randomized, seeded building and wall configurations are calculated with the
+fast solvers and with the reference implementations:
+
+- windbeam.solve_windbeam     vs the PyNite model windbeam.calculate_windbeam
+- shearwall.section_properties vs the DataFrame layer formulas of an I/T section
+
+Reported are the worst cases per quantity and the timing ratios; the run
+exits with status 1 when a fast solver is not faster than its reference.
+
+Usage:
+    python -m building.accuracy --windbeams 2000 --walls 10000 --seed 0
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from PyNite import FEModel3D
+from building import windbeam
+from building.shearwall import Shearwall, i_section_polygons, section_polygons, section_properties
+
+WINDBEAM_TOLERANCE = 1e-6  # relative to udl * width (reactions, Vz) and udl * width**2 / 8 (My)
+SECTION_TOLERANCE = 1e-9  # relative to the reference value
+EDGE_CASES = ('random', 'ends', 'one wall', 'coincident')
+WALL_SPRING = 1e12  # axial stiffness of the walls in the coincident supports model (the split does not depend on it)
+
+
+def random_windbeam_cases(n: int, seed: int = 0) -> list[dict]:
+    """
+    Returns n random windbeam configurations {'case', 'width', 'supports', 'udl'},
+    cycling through the EDGE_CASES: random insert points, walls at 0 and width,
+    a single wall and coincident walls.
+    """
+    rng = np.random.default_rng(seed)
+    cases = []
+    for idx in range(n):
+        case = EDGE_CASES[idx % len(EDGE_CASES)]
+        width = float(rng.integers(10, 81))
+        no_walls = int(rng.integers(2, 7))
+        supports = list(np.round(rng.uniform(0, width, no_walls) * 2) / 2)
+        if case == 'ends':
+            supports[:2] = [0.0, width]
+        elif case == 'one wall':
+            supports = supports[:1]
+        elif case == 'coincident':
+            supports[1] = supports[0]
+        udl = float(rng.choice([-1, 1]) * rng.uniform(0.5, 10))
+        cases.append({'case': case, 'width': width, 'supports': [float(x) for x in supports], 'udl': udl})
+    return cases
+
+
+def random_walls(n: int, seed: int = 0) -> list[Shearwall]:
+    """
+    Returns n random I, T and plain shearwalls with random alignment. Every other wall
+    has its section given as 'section_polygons': the same rectangles moved,
+    with a random start vertex and orientation.
+    """
+    rng = np.random.default_rng(seed)
+    walls = []
+    for idx in range(n):
+        # A flange has both a width and a height or neither (T and plain walls);
+        # the layer formulas count the height of a flange without width, the polygons do not
+        top, bot = rng.random(2) < 0.8
+        wall = Shearwall(
+            label=f'SW{idx}',
+            top_flange_width=int(rng.integers(4, 60)) * 50 * top,
+            top_flange_height=int(rng.integers(1, 10)) * 50 * top,
+            web_width=int(rng.integers(3, 12)) * 50,
+            web_height=int(rng.integers(20, 200)) * 50,
+            bot_flange_width=int(rng.integers(4, 60)) * 50 * bot,
+            bot_flange_height=int(rng.integers(1, 10)) * 50 * bot,
+            aligned=str(rng.choice(['left', 'center', 'right'])),
+        )
+        if idx % 2:
+            offset = rng.uniform(-5e4, 5e4, 2)
+            polygons = []
+            for ring in i_section_polygons(wall):
+                ring = np.roll(np.asarray(ring, dtype=float) + offset, int(rng.integers(4)), axis=0)
+                polygons.append((ring[::-1] if rng.random() < 0.5 else ring).tolist())
+            wall.section_polygons = polygons
+        walls.append(wall)
+    return walls
+
+
+def reference_section(wall: Shearwall) -> dict:
+    """
+    Calculates the section properties of the I/T section of a Shearwall with
+    the DataFrame layer formulas. Returns a dict with A, Iy, h, e_top, e_bot.
+    """
+    layers = [
+        [wall.top_flange_width, wall.top_flange_height],
+        [wall.web_width, wall.web_height],
+        [wall.bot_flange_width, wall.bot_flange_height]
+    ]
+
+    df = pd.DataFrame(layers, columns=["b", "h"])
+    df['A'] = df['b'] * df['h']
+    df['Iy_eigen'] = 1/12 * df['b'] * df['h']**3
+    df['center_top'] = df['h'].cumsum() - df['h'] / 2
+    df['S'] = df['A'] * df['center_top']
+
+    e_top = df['S'].sum() / df['A'].sum()
+    e_bot = df['h'].sum() - e_top
+
+    df['zwp_center_el'] = e_top - df['center_top']
+    df['Aaa'] = df['A'] * df['zwp_center_el']**2
+
+    return {
+        'A': df['A'].sum(),
+        'Iy': df['Iy_eigen'].sum() + df['Aaa'].sum(),
+        'h': df['h'].sum(),
+        'e_top': e_top,
+        'e_bot': e_bot,
+    }
+
+
+def reference_windbeam(width: float, supports: list[float], udl: float) -> dict:
+    """
+    Calculates a windbeam with the (uncached) PyNite model. PyNite counts
+    coincident supports twice, so every position is modelled once; its
+    reaction is split over the walls at that position as in the model of
+    reference_wall_shares.
+    Returns a dict with 'reactions' and the My and Vz extremes.
+    """
+    positions = sorted(set(supports))
+    nodes = sorted(set(positions) | {0.0, width})
+    reactions, data_My, data_Vz = windbeam.calculate_windbeam.__wrapped__(dict(enumerate(positions)), nodes, udl)
+    by_position = dict(zip(positions, reactions.values()))
+    shares = reference_wall_shares(width, supports, udl) if len(positions) < len(supports) else np.ones(len(supports))
+    return {
+        'reactions': np.array([by_position[x] for x in supports]) * shares,
+        'My_max': float(np.max(data_My[1])),
+        'My_min': float(np.min(data_My[1])),
+        'Vz_max': float(np.max(data_Vz[1])),
+        'Vz_min': float(np.min(data_Vz[1])),
+    }
+
+
+def reference_wall_shares(width: float, supports: list[float], udl: float) -> np.ndarray:
+    """
+    Calculates the share of every wall in the reaction at its position with a
+    PyNite model in which every wall is a node of its own, fixed and connected
+    to the windbeam by an axial spring of WALL_SPRING, so PyNite determines
+    how coincident walls share a position. Returns an array (n_supports,).
+    """
+    positions = sorted(set(supports))
+    nodes = sorted(set(positions) | {0.0, width})
+    model = FEModel3D()
+    for idx, x in enumerate(nodes):
+        model.add_node(f'N{idx}', x, 0, 0)
+    for idx, x in enumerate(positions):
+        node = f'N{nodes.index(x)}'
+        if len(positions) == 1:
+            model.def_support(node, support_DX=True, support_DY=True, support_RX=True, support_RY=True, support_RZ=True)
+        elif idx == 0:
+            model.def_support(node, support_DX=True, support_DY=True, support_RX=True)
+        else:
+            model.def_support(node, support_DY=True)
+    for idx, x in enumerate(supports):
+        model.add_node(f'W{idx}', x, 0, -1.0)
+        model.def_support(f'W{idx}', True, True, True, True, True, True)
+        model.add_spring(f'S{idx}', f'N{nodes.index(x)}', f'W{idx}', WALL_SPRING)
+    model.add_material('Concrete', E=20000, G=11200, nu=0.3, rho=2500)
+    model.add_member('Windbeam', 'N0', f'N{len(nodes) - 1}', 'Concrete', Iy=1e10, Iz=1e10, J=1, A=10000)
+    model.add_load_combo('LC1', {'WindLoad': 1.0})
+    model.add_member_dist_load('Windbeam', 'Fz', -udl, -udl, 0, nodes[-1], case='WindLoad')
+    model.analyze()
+
+    forces = np.array([model.Nodes[f'W{idx}'].RxnFZ['LC1'] for idx in range(len(supports))])
+    totals = np.array([sum(force for force, y in zip(forces, supports) if y == x) for x in supports])
+    return forces / totals
+
+
+def compare_windbeams(cases: list[dict]) -> pd.DataFrame:
+    """
+    Compares solve_windbeam to the PyNite reference for every case.
+    Returns a DataFrame with per case the relative errors and both run times (s).
+    """
+    rows = []
+    for case in cases:
+        width, supports, udl = case['width'], case['supports'], case['udl']
+        start = time.perf_counter()
+        reference = reference_windbeam(width, supports, udl)
+        t_reference = time.perf_counter() - start
+
+        start = time.perf_counter()
+        nodes = sorted(set(supports) | {0.0, width})
+        reactions, _, My, Vz = windbeam.solve_windbeam(supports, nodes, np.array([udl]))
+        t_fast = time.perf_counter() - start
+
+        force = abs(udl) * width
+        moment = abs(udl) * width**2 / 8
+        rows.append({
+            **case,
+            'reactions': np.abs(reactions[0] - reference['reactions']).max() / force,
+            'My_max': abs(My.max() - reference['My_max']) / moment,
+            'My_min': abs(My.min() - reference['My_min']) / moment,
+            'Vz_max': abs(Vz.max() - reference['Vz_max']) / force,
+            'Vz_min': abs(Vz.min() - reference['Vz_min']) / force,
+            't_reference': t_reference,
+            't_fast': t_fast,
+        })
+    return pd.DataFrame(rows)
+
+
+def compare_sections(walls: list[Shearwall]) -> tuple[pd.DataFrame, dict]:
+    """
+    Compares the batched section_properties to the DataFrame reference.
+    Returns a DataFrame with the relative errors per wall and a dict with
+    the total run times (s) 't_reference' and 't_fast'.
+    """
+    start = time.perf_counter()
+    references = [reference_section(wall) for wall in walls]
+    t_reference = time.perf_counter() - start
+
+    start = time.perf_counter()
+    props = section_properties([section_polygons(wall) for wall in walls])
+    t_fast = time.perf_counter() - start
+
+    fast = {
+        'A': props['A'],
+        'Iy': props['Iy'],
+        'h': props['y_max'] - props['y_min'],
+        'e_top': props['y_max'] - props['y_c'],
+        'e_bot': props['y_c'] - props['y_min'],
+    }
+    df = pd.DataFrame({
+        'wall': [wall.label for wall in walls],
+        'aligned': [wall.aligned for wall in walls],
+        'polygons': [wall.section_polygons is not None for wall in walls],
+    })
+    for name, values in fast.items():
+        reference = np.array([ref[name] for ref in references], dtype=float)
+        df[name] = np.abs(values - reference) / np.abs(reference)
+    return (df, {'t_reference': t_reference, 't_fast': t_fast})
+
+
+def worst_cases(df: pd.DataFrame, quantities: list[str], n: int = 3) -> pd.DataFrame:
+    """
+    Returns the n worst rows of df for every quantity, with the quantity
+    and its error in the first columns.
+    """
+    rows = []
+    for quantity in quantities:
+        worst = df.nlargest(n, quantity)
+        rows.append(worst.assign(quantity=quantity, error=worst[quantity]))
+    worst = pd.concat(rows, ignore_index=True)
+    return worst[['quantity', 'error'] + [col for col in df.columns if col not in quantities]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Differential accuracy of the fast solvers versus the references.")
+    parser.add_argument('--windbeams', type=int, default=2000, help="amount of windbeam configurations")
+    parser.add_argument('--walls', type=int, default=10000, help="amount of wall sections")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--worst', type=int, default=3, help="worst cases shown per quantity")
+    args = parser.parse_args()
+    pd.set_option('display.width', 200)
+
+    beams = compare_windbeams(random_windbeam_cases(args.windbeams, args.seed))
+    quantities = ['reactions', 'My_max', 'My_min', 'Vz_max', 'Vz_min']
+    print(f"WINDBEAM: {len(beams)} cases, max relative error per edge case")
+    print(beams.groupby('case')[quantities].max().to_string())
+    print(worst_cases(beams, quantities, args.worst).to_string())
+    failed = int((beams[quantities].max(axis=1) > WINDBEAM_TOLERANCE).sum())
+    print(f"{failed} cases exceed the tolerance {WINDBEAM_TOLERANCE:g}; "
+          f"PyNite {beams['t_reference'].sum():.2f} s, solve_windbeam {beams['t_fast'].sum():.3f} s "
+          f"(ratio {beams['t_reference'].sum() / beams['t_fast'].sum():.0f}x)\n")
+
+    sections, times = compare_sections(random_walls(args.walls, args.seed))
+    quantities = ['A', 'Iy', 'h', 'e_top', 'e_bot']
+    print(f"SECTIONS: {len(sections)} walls, max relative error")
+    print(sections.groupby('polygons')[quantities].max().to_string())
+    print(worst_cases(sections, quantities, args.worst).to_string())
+    failed = int((sections[quantities].max(axis=1) > SECTION_TOLERANCE).sum())
+    print(f"{failed} walls exceed the tolerance {SECTION_TOLERANCE:g}; "
+          f"DataFrame {times['t_reference']:.2f} s, section_properties {times['t_fast']:.3f} s "
+          f"(ratio {times['t_reference'] / times['t_fast']:.0f}x)")
+    if beams['t_fast'].sum() >= beams['t_reference'].sum() or times['t_fast'] >= times['t_reference']:
+        parser.exit(1, "a fast solver is not faster than its reference\n")
+
+
+if __name__ == '__main__':
+    main()
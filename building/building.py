@@ -1,9 +1,10 @@
 """
 A module for building data
 """
+import numpy as np
 from dataclasses import dataclass
 from typing import Optional
-from building.building_plot import expand_geom_data
+from building.building_plot import expand_geom_data, slab_faces
 from building.foundation import Foundation
 from building.shearwall import Shearwall, calc_geom_data, calculate_section, plot_section
 
@@ -20,11 +21,16 @@ class Building:
     no_shearwalls: Optional[int] = None
     N_vd: Optional[int] = None  # kN
     pd_wind: Optional[float] = None # kN/m2
+    load_combos: Optional[dict] = None  # {combo name: {load case: factor}}
+    exact_buckling: bool = True  # second order effects with F_kexact instead of F_ktot
+    floor_model: Optional[object] = None  # windbeam.WindbeamModel of the last solve
     floor_reactions: Optional[list] = None
     floor_data_My: Optional[list] = None
     floor_data_Vz: Optional[list] = None
-    floor_plot_My: Optional[list] = None
-    floor_plot_Vz: Optional[list] = None
+    floor_plot_My: Optional[bytes] = None  # PNG
+    floor_plot_Vz: Optional[bytes] = None  # PNG
+    floor_combo_reactions: Optional[np.ndarray] = None
+    floor_envelope: Optional[dict] = None
     
 
     def initialize_data(self) -> None:
@@ -34,7 +40,10 @@ class Building:
         - geometry-data of the building
         - insertion points of shearwalls
         - create shearwalls
+        - default load combinations (if none given)
         """
+        if self.load_combos is None:
+            self.load_combos = default_load_combos()
         self.calc_geom_data()
         self.sw_insert_points()
         self.create_shearwalls()
@@ -44,11 +53,12 @@ class Building:
     def calc_geom_data(self) -> None:
         """
         Function calculates geometry data of the building itself. Adds variables:
-        'nodes', 'edges' and 'faces' as lists representing the 3d geometry of the building.
+        'nodes', 'edges' and 'faces' as NumPy arrays representing the 3d geometry
+        of the building, including a floor slab on every story level.
 
-        'nodes' # [[x, y, z],...] nodes in x, y, z
-        'edges' # [[i, j],...] meaning node numbers
-        'faces' # [[i, j, k],...] meaning node numbers
+        'nodes' # (n, 3) array with x, y, z
+        'edges' # (n, 2) array with node numbers
+        'faces' # (n, 3) array with node numbers
 
         N.B.:
         'nodes_floor' # [[x, y],...] nodes in x, y on ground level
@@ -57,15 +67,14 @@ class Building:
         nodes_floor = [[0, 0], [self.width, 0], [self.width, self.depth], [0, self.depth]]
         edges_floor = [[0, 1], [1, 2], [2, 3], [3, 0]]
 
-        nodes, edges, faces = expand_geom_data(nodes_floor, edges_floor, self.height)
-
-        faces += add_roof_faces(nodes, edges)
+        nodes, edges, faces = expand_geom_data(nodes_floor, edges_floor, self.height, self.no_stories)
+        faces = np.concatenate([faces, slab_faces(len(nodes_floor), self.no_stories)])
 
         self.nodes = nodes
         self.edges = edges
         self.faces = faces
         return
-    
+
 
     def sw_insert_points(self) -> None:
         """
@@ -95,6 +104,7 @@ class Building:
             sw = Shearwall()
             sw.label = f"Shearwall {idx + 1}"
             sw.height = self.height
+            sw.no_stories = self.no_stories
             if idx == 0:
                 sw.aligned = "left"
             elif idx == self.no_shearwalls - 1:
@@ -111,15 +121,26 @@ class Building:
         self.shearwalls = shearwalls
         self.shearwall_labels = shearwall_labels
         return
-    
 
-def add_roof_faces(nodes: list[list], edges:list[list]) -> list[list]:
+
+def default_load_combos() -> dict:
     """
-    Functions adds the faces for the roof of a building.
+    Returns the default load-combination table {combo name: {load case: factor}}
+    with the windbeam load cases 'Wind' and 'Lean'.
     """
-    start_roof_idx = int(len(nodes) / 2)
-    roof_faces = [[edges[0][0] + start_roof_idx, edges[1][0] + start_roof_idx, edges[2][0] + start_roof_idx]]
-    roof_faces.append([edges[0][0] + start_roof_idx, edges[2][0] + start_roof_idx, edges[3][0] + start_roof_idx])
-    return roof_faces
+    load_combos = {
+        'LC1': {'Wind': 1.0, 'Lean': 1.0},
+        'LC2': {'Wind': -1.0, 'Lean': -1.0},  # wind from the opposite side
+        'LC3': {'Wind': 0.0, 'Lean': 1.0},
+    }
+    return load_combos
 
 
+def valid_load_combos(load_combos: Optional[dict]) -> dict:
+    """
+    Returns the load-combination table, or the default table when it has no
+    combinations (e.g. every row deleted in the editor).
+    """
+    if not load_combos:
+        return default_load_combos()
+    return load_combos
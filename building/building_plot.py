@@ -1,126 +1,262 @@
 """
 A module for plotting a building
 """
-from typing import Tuple
+import base64
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Tuple
+import numpy as np
 from plotly import graph_objects as go
 import streamlit as st
 
 
+NODE_DTYPE = np.float32
+INDEX_DTYPE = np.int32
+COORD_DECIMALS = 2  # m, i.e. cm precision of the plotted coordinates
+ENVELOPE_COLOR = 'rgb(0, 0, 255)'
+SHEARWALL_COLOR = 'rgb(255, 0, 0)'
+TYPED_ARRAY_OVERHEAD = len('"":{"dtype":"f4","bdata":""},')  # JSON around a base64 encoded array
+
+
+@dataclass
+class BuildingFigure:
+    """
+    Represents a persistent 3d figure of a building. Traces are stored per item
+    (envelope, shearwall 1, ...) as [contour, faces] with a key of the quantized
+    geometry, so only the traces of changed items need to be rebuilt on the
+    server. Streamlit still sends the full figure to the browser on every rerun.
+    """
+    fig: go.Figure
+    trace_keys: list = field(default_factory=list)
+    trace_bytes: list = field(default_factory=list)  # estimated JSON size of every trace
+    layout_bytes: int = 0  # JSON size of the figure without traces, measured once
+    traces_updated: int = 0
+    bytes_updated: int = 0  # estimated JSON of the rebuilt traces
+    bytes_figure: int = 0  # estimated JSON of the full figure, sent on every rerun
+
+
 def plot_building(building) -> go.Figure:
     """
     Plot a 3d representation of a building.
     """
+    return update_building_figure(building).fig
+
+
+def update_building_figure(
+        building,
+        bf: Optional[BuildingFigure] = None,
+        decimals: int = COORD_DECIMALS,
+        ) -> BuildingFigure:
+    """
+    Plot a 3d representation of a building into a persistent BuildingFigure.
+    When 'bf' holds the figure of the previous rerun, only the traces of items
+    whose (quantized) geometry changed are rebuilt. Otherwise a new figure is built.
+    Records the amount and estimated JSON size of the rebuilt traces and of the
+    full figure, which is what st.plotly_chart sends. The sizes follow from the
+    rebuilt arrays (see trace_json_bytes), the figure is not serialized for them.
+    """
+    items = [(building.nodes, building.edges, building.faces, ENVELOPE_COLOR)]
+    items += [(sw.nodes, sw.edges, sw.faces, SHEARWALL_COLOR) for sw in building.shearwalls]
+
+    if bf is None or len(bf.trace_keys) != len(items):
+        bf = BuildingFigure(fig=go.Figure(layout=building_layout()))
+        bf.layout_bytes = len(bf.fig.to_json())
+        bf.fig.add_traces([go.Scatter3d(), go.Mesh3d()] * len(items))
+        bf.trace_keys = [None] * len(items)
+        bf.trace_bytes = [0] * (2 * len(items))
+
+    updated = []
+    with bf.fig.batch_update():
+        for idx, (nodes, edges, faces, color) in enumerate(items):
+            nodes = quantize_nodes(nodes, decimals)
+            key = geom_key(nodes, edges, faces, color)
+            if key == bf.trace_keys[idx]:
+                continue
+            contour = contour_trace(nodes, edges, color=color, line_width=2, marker_size=2)
+            mesh = mesh_trace(nodes, faces, opacity=0.25, color=color)
+            bf.fig.data[2 * idx].update(contour.to_plotly_json())
+            bf.fig.data[2 * idx + 1].update(mesh.to_plotly_json())
+            bf.trace_keys[idx] = key
+            updated += [2 * idx, 2 * idx + 1]
+
+        bf.fig.layout.scene.xaxis.range = (0, building.width * 2.2)
+        bf.fig.layout.scene.yaxis.range = (0, building.depth * 2.2)
+
+    for idx in updated:
+        bf.trace_bytes[idx] = trace_json_bytes(bf.fig.data[idx])
+    bf.traces_updated = len(updated)
+    bf.bytes_updated = sum(bf.trace_bytes[idx] for idx in updated)
+    bf.bytes_figure = sum(bf.trace_bytes) + bf.layout_bytes
+    return bf
+
+
+def trace_json_bytes(trace) -> int:
+    """
+    Estimates the JSON size of a trace as plotly serializes a figure: arrays as
+    base64 encoded typed arrays (plotly escapes '/' as '\\u002f'), the other
+    properties as plain JSON.
+    """
+    size = 0
+    for name, value in trace.to_plotly_json().items():
+        if isinstance(value, np.ndarray):
+            bdata = base64.b64encode(np.ascontiguousarray(value))
+            size += len(name) + TYPED_ARRAY_OVERHEAD + len(bdata) + 5 * bdata.count(b'/')
+        else:
+            size += len(json.dumps({name: value}, separators=(',', ':')))
+    return size
+
+
+def building_layout() -> go.Layout:
+    """
+    Returns the layout of the building viewport.
+    """
     layout = go.Layout(
-        autosize=False, width=1200, height=800,
+        autosize=False, width=1000, height=1000,
         title = 'Simplified Building Viewport',
         scene = dict(
             aspectmode='data',
-            aspectratio=go.layout.scene.Aspectratio(x=0.4, y=0.4, z=0.4)
+            aspectratio=go.layout.scene.Aspectratio(x=0.4, y=0.4, z=0.4),
+            xaxis_autorange="reversed",
         ),
     )
-    fig = go.Figure(layout=layout)
-    
-    plot_item_contour(fig, building.nodes, building.edges, 
-                      color='rgb(0, 0, 255)', line_width=2, marker_size=2)
-    plot_item_faces(fig, building.nodes, building.faces, opacity=0.25, 
-                    color='rgb(0, 0, 255)')
-
-    for shearwall in building.shearwalls:
-        plot_item_contour(fig, shearwall.nodes, shearwall.edges, 
-                          color='rgb(255, 0, 0)', line_width=2, marker_size=2)
-        plot_item_faces(fig, shearwall.nodes, shearwall.faces, 
-                        opacity=0.25, color='rgb(255, 0, 0)')
-    
-    fig.layout.height = 1000
-    fig.layout.width = 1000
-
-    fig.layout.scene.xaxis.range = (0, building.width * 2.2)
-    fig.layout.scene.yaxis.range = (0, building.depth * 2.2)
-    fig.update_scenes(xaxis_autorange="reversed")
-    return fig
-
-
-def plot_item_faces(
-        fig: go.Figure, 
-        nodes: list[list], 
-        faces: list[list], 
-        opacity: float=0.25, 
+    return layout
+
+
+def quantize_nodes(nodes: np.ndarray, decimals: int = COORD_DECIMALS) -> np.ndarray:
+    """
+    Round node coordinates to 'decimals' to shrink the plotted JSON payload.
+    """
+    return np.round(np.asarray(nodes, dtype=NODE_DTYPE), decimals)
+
+
+def geom_key(nodes: np.ndarray, edges: np.ndarray, faces: np.ndarray, color: str) -> str:
+    """
+    Returns a hash key of the geometry (and color) of a plotted item.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for arr in (nodes, edges, faces):
+        arr = np.ascontiguousarray(arr)
+        digest.update(str(arr.shape).encode())
+        digest.update(arr.tobytes())
+    digest.update(color.encode())
+    return digest.hexdigest()
+
+
+def mesh_trace(
+        nodes: np.ndarray,
+        faces: np.ndarray,
+        opacity: float=0.25,
         color: str = 'rgb(0, 0, 255)'
-        ) -> go.Figure:
-    """
-    Plot the faces of a building.
-    """
-    x, y, z = zip(*nodes)
-    i, j, k = zip(*faces)
-
-    fig.add_trace(
-        go.Mesh3d(
-            x = x,
-            y = y,
-            z = z,
-            i = i,
-            j = j,
-            k = k,
-            opacity = opacity,
-            color = color
-        )
+        ) -> go.Mesh3d:
+    """
+    Returns a Mesh3d trace of the indexed triangle mesh (nodes, faces).
+    """
+    nodes = np.asarray(nodes)
+    faces = np.asarray(faces)
+    return go.Mesh3d(
+        x = nodes[:, 0],
+        y = nodes[:, 1],
+        z = nodes[:, 2],
+        i = faces[:, 0],
+        j = faces[:, 1],
+        k = faces[:, 2],
+        opacity = opacity,
+        color = color
     )
-    return fig
 
 
-def plot_item_contour(
-        fig: go.Figure, 
-        nodes: list[list], 
-        edges: list[list], 
-        color: str='rgb(0, 0, 255)', 
-        line_width: int=2, 
+def contour_trace(
+        nodes: np.ndarray,
+        edges: np.ndarray,
+        color: str='rgb(0, 0, 255)',
+        line_width: int=2,
         marker_size: int =2
-        ) -> go.Figure:
-    """
-    Plot the contour of a building.
-    """
-    for i_node, j_node in edges:
-        x_coord_i, y_coord_i, z_coord_i = nodes[i_node]
-        x_coord_j, y_coord_j, z_coord_j = nodes[j_node]
-
-        trace = go.Scatter3d(
-            x = [x_coord_i, x_coord_j],
-            y = [y_coord_i, y_coord_j],
-            z = [z_coord_i, z_coord_j],
-            line = {
-                'color': color,
-                'width': line_width,
-            },
-            marker = {
-                'size': marker_size
-            },
-            showlegend = False
-        )
-        fig.add_trace(trace)
-    return fig
+        ) -> go.Scatter3d:
+    """
+    Returns a Scatter3d trace of all edges. Line segments are
+    separated by NaN values so plotly draws them as one trace.
+    """
+    xyz = edge_polylines(nodes, edges)
+    return go.Scatter3d(
+        x = xyz[:, 0],
+        y = xyz[:, 1],
+        z = xyz[:, 2],
+        line = {
+            'color': color,
+            'width': line_width,
+        },
+        marker = {
+            'size': marker_size
+        },
+        showlegend = False
+    )
+
+
+def edge_polylines(nodes: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Returns a (3 * n_edges, 3) array [i_node, j_node, NaN, ...] with the
+    coordinates of every edge, separated by a row of NaN values.
+    """
+    nodes = np.asarray(nodes)
+    edges = np.asarray(edges)
+    xyz = np.full((len(edges), 3, 3), np.nan, dtype=nodes.dtype)
+    xyz[:, 0] = nodes[edges[:, 0]]
+    xyz[:, 1] = nodes[edges[:, 1]]
+    return xyz.reshape(-1, 3)
 
 
 def expand_geom_data(
-        nodes_floor: list[list], 
-        edges_floor: list[list], 
-        height: float
-        ) -> Tuple[list[list]]:
+        nodes_floor: Sequence,
+        edges_floor: Sequence,
+        height: float,
+        no_stories: int = 1,
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
-    Expand 2d geometry data into the 3rd dimension by adding height.
+    Expand 2d geometry data into the 3rd dimension by repeating the floor plan
+    at every story level (no_stories + 1 levels from 0 to height).
+    Returns a tuple of NumPy buffers:
+
+    'nodes' # (n_levels * n_nodes, 3) array with x, y, z; level by level
+    'edges' # (n, 2) array with node numbers, horizontal and vertical per story
+    'faces' # (n, 3) array with node numbers, two triangles per edge per story
     """
+    nodes_floor = np.asarray(nodes_floor, dtype=NODE_DTYPE).reshape(-1, 2)
+    edges_floor = np.asarray(edges_floor, dtype=INDEX_DTYPE).reshape(-1, 2)
+    n_nodes = len(nodes_floor)
+    n_levels = no_stories + 1
+
     # Add height to node coordinates
-    nodes = [node_floor + [0] for node_floor in nodes_floor]
-    nodes += [node_floor + [height] for node_floor in nodes_floor]
-    
-    # Define edges 3d
-    start_roof_idx = int(len(nodes) / 2)
-    # Horizontal edges
-    edges = edges_floor + [[x + start_roof_idx, y + start_roof_idx] for x, y in edges_floor]
-    # Vertical edges
-    edges += [[idx, idx + start_roof_idx] for idx, node in enumerate(nodes_floor)]
-    
-    faces = []
-    for edge in edges_floor:
-        faces.append(edge + [edge[0] + start_roof_idx])
-        faces.append([edge[0] + start_roof_idx, edge[1] + start_roof_idx, edge[1]])
-    return (nodes, edges, faces)
\ No newline at end of file
+    nodes = np.empty((n_levels, n_nodes, 3), dtype=NODE_DTYPE)
+    nodes[:, :, :2] = nodes_floor
+    nodes[:, :, 2] = np.linspace(0, height, n_levels, dtype=NODE_DTYPE)[:, None]
+    nodes = nodes.reshape(-1, 3)
+
+    # Horizontal edges on every level
+    level_offsets = (np.arange(n_levels, dtype=INDEX_DTYPE) * n_nodes)[:, None, None]
+    edges_hor = (edges_floor[None] + level_offsets).reshape(-1, 2)
+    # Vertical edges for every story
+    lower = np.arange(no_stories * n_nodes, dtype=INDEX_DTYPE)
+    edges_ver = np.column_stack([lower, lower + n_nodes])
+    edges = np.concatenate([edges_hor, edges_ver])
+
+    # Two triangles per floor edge per story
+    bot_i, bot_j = (edges_floor[None] + level_offsets[:-1]).reshape(-1, 2).T
+    top_i, top_j = bot_i + n_nodes, bot_j + n_nodes
+    faces = np.stack([
+        np.column_stack([bot_i, bot_j, top_i]),
+        np.column_stack([top_i, top_j, bot_j]),
+    ], axis=1).reshape(-1, 3)
+    return (nodes, edges, faces)
+
+
+def slab_faces(n_nodes: int, no_stories: int) -> np.ndarray:
+    """
+    Returns the faces of the floor slabs on every story level above ground
+    (the top slab being the roof), for a convex floor plan of n_nodes nodes
+    as laid out by expand_geom_data. The slabs are fan triangulated.
+    """
+    fan = np.arange(1, n_nodes - 1, dtype=INDEX_DTYPE)
+    fan_faces = np.column_stack([np.zeros_like(fan), fan, fan + 1])
+    level_offsets = (np.arange(1, no_stories + 1, dtype=INDEX_DTYPE) * n_nodes)[:, None, None]
+    return (fan_faces[None] + level_offsets).reshape(-1, 3)
@@ -1,11 +1,18 @@
+import functools
 from handcalcs.decorator import handcalc
-from typing import Dict, Optional, Tuple
-from building.foundation import Foundation, calculate_foundation
+from typing import Callable, Optional, Tuple
+import numpy as np
+from scipy.special import jv
+from building.foundation import calculate_pile_forces
 from building.shearwall import Shearwall
 from building.building import Building
+from building.results import format_result
 import streamlit as st
 
 hc_renderer = handcalc(override='long', decimal_separator=',')
+HC_CACHE_SIZE = 4096  # rendered handcalculations kept per template
+
+BESSEL_ROOT = 1.8663508588738948  # first zero of J_-1/3; 2.25 * BESSEL_ROOT**2 = 7.837 (fixed cantilever)
 
 
 def F_k1(E: float, I_y: float, l: float) -> float:
@@ -33,6 +40,57 @@ def F_ktot(F_k1: float, F_k2: float) -> float:
     return F_ktot
 
 
+def F_kexact(E: float, I_y: float, C_rot: float, l: float, tol: float = 1e-12, max_iter: int = 50) -> np.ndarray:
+    """
+    Function calculates the exact critical load (kN) of a cantilever with a
+    springrotation support under a uniformly distributed axial load, for many
+    walls at once (arguments broadcast as arrays).
+
+    With k = 2/3 * sqrt(q * l**3 / EI) and the relative flexibility of the
+    support phi = EI / (C_rot * l) the characteristic equation reads
+
+        k**(1/3) * (J_-1/3(k) - 1.5 * phi * k * J_2/3(k)) = 0
+
+    of which the first root lies in (0, BESSEL_ROOT]. It is solved by a
+    vectorized Newton iteration, safeguarded by bisection, starting at the
+    Foeppl-Dunkerley estimate. The critical load is q * l = 2.25 * k**2 * EI / l**2.
+    """
+    EI = (E * np.asarray(I_y, dtype=float)) / 10**9 # kNm2
+    EI, C_rot, l = np.broadcast_arrays(EI, np.asarray(C_rot, dtype=float), np.asarray(l, dtype=float))
+    with np.errstate(divide='ignore'):
+        phi = np.where(C_rot > 0, EI / (C_rot * l), np.inf)
+
+    def h(k: np.ndarray, phi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        k_13 = np.cbrt(k)
+        J_m13 = jv(-1/3, k)
+        J_23 = jv(2/3, k)
+        value = k_13 * J_m13 - 1.5 * phi * k * k_13 * J_23
+        slope = -k_13 * ((1 + phi) * J_23 + 1.5 * phi * k * J_m13)
+        return (value, slope)
+
+    phi = phi.ravel()
+    lambda_dunkerley = 1 / (1 / (2.25 * BESSEL_ROOT**2) + phi / 2)
+    k = np.sqrt(lambda_dunkerley / 2.25)
+    lo = np.zeros_like(k)
+    hi = np.full_like(k, BESSEL_ROOT)
+    active = np.flatnonzero(phi < 1e12)
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        k_a, lo_a, hi_a = k[active], lo[active], hi[active]
+        value, slope = h(k_a, phi[active])
+        lo_a = np.where(value > 0, k_a, lo_a)
+        hi_a = np.where(value > 0, hi_a, k_a)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k_new = k_a - value / slope
+        k_new = np.where((k_new >= lo_a) & (k_new <= hi_a), k_new, (lo_a + hi_a) / 2)
+        k[active], lo[active], hi[active] = k_new, lo_a, hi_a
+        active = active[np.abs(k_new - k_a) > tol * BESSEL_ROOT]
+    k = np.where(phi < 1e12, k, 0.0).reshape(EI.shape)
+    F_kexact = 2.25 * k**2 * EI / l**2 # kN
+    return F_kexact
+
+
 def UDL_wind(pd_wind: float, width: float, pct_wind: float) -> float:
     """
     Function calculates the UDL windload on a shearwall.
@@ -84,16 +142,23 @@ def calculate_moment(UDL_tot: float, l: float, n: float) -> float:
     return M_SecondOrder
 
 
-hc_calculate_foundation = hc_renderer(calculate_foundation)
-hc_F_k1 = hc_renderer(F_k1)
-hc_F_k2 = hc_renderer(F_k2)
-hc_F_ktot = hc_renderer(F_ktot)
-hc_UDL_wind = hc_renderer(UDL_wind)
-hc_UDL_lean = hc_renderer(UDL_lean)
-hc_UDL_tot = hc_renderer(UDL_tot)
-hc_N_vd = hc_renderer(N_vd)
-hc_second_order_effect = hc_renderer(second_order_effect)
-hc_calculate_moment = hc_renderer(calculate_moment)
+def cached_renderer(func: Callable) -> Callable:
+    """
+    Function renders func with handcalcs and caches the (latex, value) per
+    (hashable) arguments, shared by all sessions of the process.
+    """
+    return functools.lru_cache(maxsize=HC_CACHE_SIZE)(hc_renderer(func))
+
+
+hc_F_k1 = cached_renderer(F_k1)
+hc_F_k2 = cached_renderer(F_k2)
+hc_F_ktot = cached_renderer(F_ktot)
+hc_UDL_wind = cached_renderer(UDL_wind)
+hc_UDL_lean = cached_renderer(UDL_lean)
+hc_UDL_tot = cached_renderer(UDL_tot)
+hc_N_vd = cached_renderer(N_vd)
+hc_second_order_effect = cached_renderer(second_order_effect)
+hc_calculate_moment = cached_renderer(calculate_moment)
 
 
 # No Cache
@@ -102,32 +167,46 @@ def sw_calculation(sw: Shearwall, bd: Building) -> Shearwall:
     Function makes handcalculation of a shearwall.
     Returns the shearwall with added dict variables 
     
-    'results'           : Nicely formatted values from the calculation
+    'results'           : Numeric values from the calculation (see results.RESULT_SCHEMA)
     'results_latex'     : Latex epresentation of the calculation
     """
-    N_vd_wall_latex, N_vd_wall = hc_N_vd(sw.windshare, bd.N_vd)
-    UDL_wind_latex, UDL_wind = hc_UDL_wind(bd.pd_wind, bd.width, sw.windshare)
-    UDL_lean_latex, UDL_lean = hc_UDL_lean(bd.height, bd.N_vd, sw.windshare)
+    values = sw_calculation_values([sw], [bd])[0]
+    combo, M_combos = values['Governing'], values['M_combos']
+    windshare = sw.windshares[combo]
+    f_wind = bd.load_combos[combo].get('Wind', 0.0)
+    f_lean = bd.load_combos[combo].get('Lean', 0.0)
+
+    N_vd_wall_latex, N_vd_wall = hc_N_vd(windshare, bd.N_vd)
+    UDL_wind_latex, UDL_wind = hc_UDL_wind(f_wind * bd.pd_wind, bd.width, windshare)
+    UDL_lean_latex, UDL_lean = hc_UDL_lean(bd.height, f_lean * bd.N_vd, windshare)
     UDL_tot_latex, UDL_tot = hc_UDL_tot(UDL_wind, UDL_lean)
     F_k1_latex, F_k1 = hc_F_k1(sw.E_wall, sw.Iy, bd.height)
     F_k2_latex, F_k2 = hc_F_k2(sw.foundation.foundation_stiffness, bd.height)
     F_ktot_latex, F_ktot = hc_F_ktot(F_k1, F_k2)
-    n_latex, n_value = hc_second_order_effect(F_ktot, N_vd_wall)
+    F_kexact_value = values['F_kexact']
+    F_kcr = F_kexact_value if bd.exact_buckling else F_ktot
+    n_latex, n_value = hc_second_order_effect(F_kcr, N_vd_wall)
     M_SecondOrder_latex, M_SecondOrder = hc_calculate_moment(UDL_tot, bd.height, n_value)
+    fd = calculate_pile_forces(sw.foundation, N_vd_wall, M_SecondOrder)
 
     results = {
-        'Windshare': f'{sw.windshare * 100:.2f}%',
-        'UDL_wind': f'{UDL_wind:.2f} kN/m1',
-        'UDL_lean': f'{UDL_lean:.2f} kN/m1',
-        'UDL_tot': f'{UDL_tot:.2f} kN/m1',
-        'C_rot': f'{sw.foundation.foundation_stiffness:.3e} kNm/rad',
-        'N_vd_wall': f'{N_vd_wall:.0f} kN',
-        'F_k1': f'{F_k1:.0f} kN',
-        'F_k2': f'{F_k2:.0f} kN',
-        'F_ktot': f'{F_ktot:.0f} kN',
-        'n_value': f'{n_value:.3f}',
-        'SecondOrderEffect': f'{(n_value / (n_value - 1) - 1) * 100:.2f}%',
-        'M_SecondOrder': f'{M_SecondOrder:.0f} kNm',
+        'Governing': combo,
+        'Windshare': float(windshare),
+        'UDL_wind': float(UDL_wind),
+        'UDL_lean': float(UDL_lean),
+        'UDL_tot': float(UDL_tot),
+        'C_rot': float(sw.foundation.foundation_stiffness),
+        'N_vd_wall': float(N_vd_wall),
+        'F_k1': float(F_k1),
+        'F_k2': float(F_k2),
+        'F_ktot': float(F_ktot),
+        'F_kexact': F_kexact_value,
+        'F_kcr': 'F_kexact' if bd.exact_buckling else 'F_ktot',
+        'n_value': float(n_value),
+        'SecondOrderEffect': float(n_value / (n_value - 1) - 1),
+        'M_SecondOrder': float(M_SecondOrder),
+        'F_pile_max': float(fd.pile_forces.max()),
+        'F_pile_min': float(fd.pile_forces.min()),
     }
     results_latex = {
         'UDL_wind': UDL_wind_latex,
@@ -142,43 +221,145 @@ def sw_calculation(sw: Shearwall, bd: Building) -> Shearwall:
     }
     sw.results = results
     sw.results_latex = results_latex
+    sw.M_combos = M_combos
     return sw
 
 
-def display_sw_calculation(sw: Shearwall) -> None:
+def sw_calculation_values(walls: list[Shearwall], buildings: list[Building]) -> list[dict]:
     """
-    Function displays the latex handcalculation of a shearwall.
+    Function makes the numeric calculation (without handcalcs) of many
+    shearwalls at once, walls[i] belonging to buildings[i]. All walls and load
+    combinations are evaluated as one (n_walls, n_combos) array.
+    Returns a dict of floats per shearwall with the values of the governing
+    combination ('Governing') and 'M_combos' with the moment of every combination.
     """
-    st.subheader('Wall load')
-    st.write(f'This shearwall takes {sw.windshare * 100:.2f}% of the windload and the stability of the building weight')
-    
-    st.write('\nBuilding weight to stabilize:')
-    st.latex(sw.results_latex["N_vd_wall"])
-
-    st.write('\nWindload on shearwall:')
-    st.latex(sw.results_latex["UDL_wind"])
-    
-    st.write('\nLoad on shearwall by $\\theta_{lean}$:')
-    st.latex(sw.results_latex["UDL_lean"])
-
-    st.write('\nTotal load on shearwall:')
-    st.latex(sw.results_latex["UDL_tot"])
-    st.divider()
-
-    st.subheader('Wall capacity')
-    st.latex(sw.results_latex["F_k1"])
-
-    st.latex(sw.results_latex["F_k2"])
-
-    # Can we put this latex line in the function?
-    st.latex('\\frac{1}{F_{ktot}} = \\frac{1}{F_{k1}} + \\frac{1}{F_{k2}}')
-    st.latex(sw.results_latex["F_ktot"])
-    st.divider()
-
-    st.subheader('Second order effects')
-    st.latex(sw.results_latex["n_latex"])
-    st.divider()
+    n_combos = max(len(bd.load_combos) for bd in buildings)
+    shape = (len(walls), n_combos)
+    windshares = np.full(shape, np.nan)
+    f_wind = np.zeros(shape)
+    f_lean = np.zeros(shape)
+    for idx, (sw, bd) in enumerate(zip(walls, buildings)):
+        for jdx, combo in enumerate(bd.load_combos):
+            windshares[idx, jdx] = sw.windshares[combo]
+            f_wind[idx, jdx] = bd.load_combos[combo].get('Wind', 0.0)
+            f_lean[idx, jdx] = bd.load_combos[combo].get('Lean', 0.0)
+
+    def column(values: list) -> np.ndarray:
+        return np.array(values, dtype=float)[:, None]
+
+    N_vd_bd = column([bd.N_vd for bd in buildings])
+    height = column([bd.height for bd in buildings])
+    UDL_wind_c = f_wind * UDL_wind(column([bd.pd_wind for bd in buildings]), column([bd.width for bd in buildings]), windshares)
+    UDL_lean_c = f_lean * UDL_lean(height, N_vd_bd, windshares)
+    N_vd_wall = N_vd(windshares, N_vd_bd)
+    F_k1_c = F_k1(column([sw.E_wall for sw in walls]), column([sw.Iy for sw in walls]), height)
+    F_k2_c = F_k2(column([sw.foundation.foundation_stiffness for sw in walls]), height)
+    F_ktot_c = F_ktot(F_k1_c, F_k2_c)
+    F_kexact_c = F_kexact(
+        column([sw.E_wall for sw in walls]), column([sw.Iy for sw in walls]),
+        column([sw.foundation.foundation_stiffness for sw in walls]), height,
+    )
+    F_kcr = np.where(column([bd.exact_buckling for bd in buildings]) > 0, F_kexact_c, F_ktot_c)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n_value = second_order_effect(F_kcr, N_vd_wall)
+        M_combos = calculate_moment(UDL_tot(UDL_wind_c, UDL_lean_c), height, n_value)
+    M_abs = np.where(np.isnan(M_combos), -np.inf, np.abs(M_combos))
+    governing = M_abs.argmax(axis=1)
+
+    values = []
+    for idx, (sw, bd) in enumerate(zip(walls, buildings)):
+        g = governing[idx]
+        combos = list(bd.load_combos)
+        n_g = n_value[idx, g]
+        values.append({
+            'Governing': combos[g],
+            'Windshare': float(windshares[idx, g]),
+            'UDL_wind': float(UDL_wind_c[idx, g]),
+            'UDL_lean': float(UDL_lean_c[idx, g]),
+            'UDL_tot': float(UDL_wind_c[idx, g] + UDL_lean_c[idx, g]),
+            'C_rot': float(sw.foundation.foundation_stiffness),
+            'N_vd_wall': float(N_vd_wall[idx, g]),
+            'F_k1': float(F_k1_c[idx, 0]),
+            'F_k2': float(F_k2_c[idx, 0]),
+            'F_ktot': float(F_ktot_c[idx, 0]),
+            'F_kexact': float(F_kexact_c[idx, 0]),
+            'F_kcr': 'F_kexact' if bd.exact_buckling else 'F_ktot',
+            'n_value': float(n_g),
+            'SecondOrderEffect': float(n_g / (n_g - 1) - 1),
+            'M_SecondOrder': float(M_combos[idx, g]),
+            'M_combos': dict(zip(combos, M_combos[idx, :len(combos)].tolist())),
+        })
+    return values
+
+
+F_ktot_latex_formula = '\\frac{1}{F_{ktot}} = \\frac{1}{F_{k1}} + \\frac{1}{F_{k2}}'
+CRITICAL_LOAD_LABELS = {
+    'F_ktot': '$F_{ktot}$ (Föppl-Dunkerley)',
+    'F_kexact': '$F_{kexact}$ (exact)',
+}
+
+
+def sw_calculation_blocks(sw: Shearwall) -> list[Tuple[str, str]]:
+    """
+    Function returns the handcalculation of a shearwall as an ordered list of
+    (kind, content) blocks, kind being 'subheader', 'text', 'latex' or 'divider'.
+    Shared by the app and the reports.
+    """
+    blocks = [
+        ('subheader', 'Wall load'),
+        ('text', f'This shearwall takes {sw.windshare * 100:.2f}% of the windload and the stability of the building weight'),
+        ('text', f'Governing load combination: {sw.results["Governing"]} '
+                 f'({", ".join(f"{combo}: {M:.0f} kNm" for combo, M in sw.M_combos.items())})'),
+
+        ('text', 'Building weight to stabilize:'),
+        ('latex', sw.results_latex["N_vd_wall"]),
+
+        ('text', 'Windload on shearwall:'),
+        ('latex', sw.results_latex["UDL_wind"]),
+
+        ('text', 'Load on shearwall by $\\theta_{lean}$:'),
+        ('latex', sw.results_latex["UDL_lean"]),
+
+        ('text', 'Total load on shearwall:'),
+        ('latex', sw.results_latex["UDL_tot"]),
+        ('divider', ''),
+
+        ('subheader', 'Wall capacity'),
+        ('latex', sw.results_latex["F_k1"]),
+        ('latex', sw.results_latex["F_k2"]),
+        ('latex', F_ktot_latex_formula),
+        ('latex', sw.results_latex["F_ktot"]),
+        ('text', f'Exact critical load of the cantilever on a springrotation support '
+                 f'under distributed axial load: $F_{{kexact}}$ = {format_result("F_kexact", sw.results["F_kexact"])}'),
+        ('divider', ''),
+
+        ('subheader', 'Second order effects'),
+        ('text', f'Critical load: {CRITICAL_LOAD_LABELS[sw.results["F_kcr"]]}'),
+        ('latex', sw.results_latex["n_latex"]),
+        ('divider', ''),
+
+        ('subheader', 'Moments at groundfloor level'),
+        ('latex', sw.results_latex["M_SecondOrder"]),
+        ('divider', ''),
+
+        ('subheader', 'Pile forces'),
+        ('text', f'Axial pile forces from $N_{{vd,wall}}$ and $M_{{SecondOrder}}$: '
+                 f'{format_result("F_pile_min", sw.results["F_pile_min"])} to '
+                 f'{format_result("F_pile_max", sw.results["F_pile_max"])} (compression positive)'),
+    ]
+    return blocks
 
-    st.subheader('Moments at groundfloor level')
-    st.latex(sw.results_latex["M_SecondOrder"])
 
+def display_sw_calculation(sw: Shearwall) -> None:
+    """
+    Function displays the latex handcalculation of a shearwall.
+    """
+    for kind, content in sw_calculation_blocks(sw):
+        if kind == 'subheader':
+            st.subheader(content)
+        elif kind == 'text':
+            st.write(content)
+        elif kind == 'latex':
+            st.latex(content)
+        else:
+            st.divider()
@@ -0,0 +1,189 @@
+"""
+A module for the lateral distribution of wind over shearwalls by rigid floors.
+
+Every floor is a rigid diaphragm with three degrees of freedom: the
+translations u_x, u_y and the rotation theta about the origin of the plan.
+A shearwall at plan position (x, y), with its strong axis at angle alpha to
+the x axis, is a stiffness element in its strong and in its weak direction.
+A wall stiffness k in direction (c, s) = (cos, sin) adds k * a * a.T to the
+3x3 floor stiffness of the story, with a = (c, s, x * s - y * c).
+
+The story shears and torsion of both wind directions are distributed for all
+stories and walls at once: the floor stiffnesses (n_stories, 3, 3) are
+assembled with einsum and solved as one batch.
+"""
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import numpy as np
+from building.building import Building
+
+UNSTABLE_CONDITION = 1e12  # condition number of a floor stiffness regarded as singular
+
+
+@dataclass
+class DiaphragmResult:
+    """
+    Represents the distribution of the story shears of load cases over the walls.
+    """
+    cases: list  # load case names
+    angle: np.ndarray  # (n_walls,) strong axis of the walls (degrees to the x axis)
+    loads: np.ndarray  # (n_stories, n_cases, 3) story shears V_x, V_y (kN) and torsion T about the origin (kNm)
+    stiffness: np.ndarray  # (n_stories, 3, 3) floor stiffness
+    centre_of_rigidity: np.ndarray  # (n_stories, 2) x, y (m)
+    displacements: np.ndarray  # (n_stories, n_cases, 3) u_x, u_y (m), theta (rad) of the story
+    forces_strong: np.ndarray  # (n_stories, n_cases, n_walls) wall shear in the strong direction (kN)
+    forces_weak: np.ndarray  # (n_stories, n_cases, n_walls) wall shear in the weak direction (kN)
+
+
+def wall_stiffness(E: np.ndarray, I: np.ndarray, height: np.ndarray, C_rot: np.ndarray = np.inf) -> np.ndarray:
+    """
+    Function calculates the lateral stiffness (kN/m) of a cantilever wall
+    at its top (E in MPa, I in mm4, height in m) on a rotational spring
+    C_rot (kNm/rad, np.inf: fixed): k = 1 / (H^3 / (3 EI) + H^2 / C_rot).
+    """
+    EI = (E * np.asarray(I, dtype=float)) / 10**9 # kNm2
+    height = np.asarray(height, dtype=float)
+    return 1 / (height**3 / (3 * EI) + height**2 / np.asarray(C_rot, dtype=float))
+
+
+def direction_vectors(x: np.ndarray, y: np.ndarray, angle: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Function returns the (n_walls, 3) vectors a relating the floor
+    displacements (u_x, u_y, theta) to the displacement of the walls in their
+    strong (angle) and weak (angle + 90 degrees) direction; angle in radians.
+    """
+    c, s = np.cos(angle), np.sin(angle)
+    a_strong = np.stack([c, s, x * s - y * c], axis=-1)
+    a_weak = np.stack([-s, c, x * c + y * s], axis=-1)
+    return (a_strong, a_weak)
+
+
+def floor_stiffness(a_strong: np.ndarray, a_weak: np.ndarray, k_strong: np.ndarray, k_weak: np.ndarray) -> np.ndarray:
+    """
+    Function assembles the 3x3 floor stiffness of every story from the wall
+    stiffnesses k (n_stories, n_walls). Returns an array (n_stories, 3, 3).
+    """
+    return (np.einsum('sw,wi,wj->sij', k_strong, a_strong, a_strong)
+            + np.einsum('sw,wi,wj->sij', k_weak, a_weak, a_weak))
+
+
+def centre_of_rigidity(K: np.ndarray) -> np.ndarray:
+    """
+    Function returns the centre of rigidity (n_stories, 2) of floor
+    stiffnesses K (n_stories, 3, 3): the point about which a rotation of the
+    floor needs no horizontal force.
+    """
+    arm = np.linalg.solve(K[:, :2, :2], K[:, :2, 2:])[..., 0]  # (-y_r, x_r)
+    return np.stack([arm[:, 1], -arm[:, 0]], axis=-1)
+
+
+def story_loads(
+    width: float,
+    depth: float,
+    height: float,
+    no_stories: int,
+    pd_wind: float,
+    eccentricity: float = 0.0,
+    ) -> tuple[list, np.ndarray]:
+    """
+    Function calculates the story shears and torsion of the wind in x and y
+    direction. The floors take the wind of half the story below and above
+    them; the wind acts at the centre of the facade, shifted by +/- the
+    accidental eccentricity (fraction of the facade width) if given.
+    Returns a tuple (case names, loads (n_stories, n_cases, 3)).
+    """
+    h_story = height / no_stories
+    above = height - (np.arange(no_stories) + 0.5) * h_story  # m of facade above the middle of every story
+    shifts = [0.0] if eccentricity == 0 else [eccentricity, -eccentricity]
+    cases, loads = [], []
+    for direction in ('X', 'Y'):
+        for shift in shifts:
+            if direction == 'X':
+                V = pd_wind * depth * above
+                load = np.stack([V, np.zeros_like(V), -(depth / 2 + shift * depth) * V], axis=-1)
+            else:
+                V = pd_wind * width * above
+                load = np.stack([np.zeros_like(V), V, (width / 2 + shift * width) * V], axis=-1)
+            cases.append(f'Wind {direction}' + (f' {shift:+.0%}' if shift else ''))
+            loads.append(load)
+    return (cases, np.stack(loads, axis=1))
+
+
+def solve_diaphragms(
+    x: Sequence[float],
+    y: Sequence[float],
+    angle: Sequence[float],
+    k_strong: np.ndarray,
+    k_weak: np.ndarray,
+    loads: np.ndarray,
+    cases: Optional[list] = None,
+    ) -> DiaphragmResult:
+    """
+    Function distributes the story loads (n_stories, n_cases, 3) over walls
+    at plan positions x, y (m) with their strong axis at angle (degrees) and
+    stiffnesses k (n_walls,) or (n_stories, n_walls) kN/m.
+    Raises a ValueError if a floor is not stable (walls all parallel or
+    through one point).
+    Returns a DiaphragmResult.
+    """
+    x, y, angle = (np.asarray(values, dtype=float) for values in (x, y, angle))
+    a_strong, a_weak = direction_vectors(x, y, np.radians(angle))
+    n_stories = loads.shape[0]
+    k_strong = np.broadcast_to(np.asarray(k_strong, dtype=float), (n_stories, len(x)))
+    k_weak = np.broadcast_to(np.asarray(k_weak, dtype=float), (n_stories, len(x)))
+
+    K = floor_stiffness(a_strong, a_weak, k_strong, k_weak)
+    unstable = np.flatnonzero(~(np.linalg.cond(K) < UNSTABLE_CONDITION))
+    if len(unstable):
+        raise ValueError(f"Floor stiffness is singular at stories {unstable.tolist()}: the walls cannot take torsion")
+    displacements = np.linalg.solve(K[:, None], loads[..., None])[..., 0]
+    return DiaphragmResult(
+        cases=cases if cases is not None else [f'Case {idx + 1}' for idx in range(loads.shape[1])],
+        angle=angle,
+        loads=loads,
+        stiffness=K,
+        centre_of_rigidity=centre_of_rigidity(K),
+        displacements=displacements,
+        forces_strong=k_strong[:, None, :] * np.einsum('scj,wj->scw', displacements, a_strong),
+        forces_weak=k_weak[:, None, :] * np.einsum('scj,wj->scw', displacements, a_weak),
+    )
+
+
+def building_diaphragm(bd: Building, eccentricity: float = 0.0) -> DiaphragmResult:
+    """
+    Takes a Building with calculated shearwall sections and foundations and
+    distributes the wind in x and y direction over its shearwalls, per story.
+    The walls act in the principal directions of their section (I1, I2): the
+    strong direction lies at alpha from the web (plan_angle), which matters for
+    asymmetric (L, U) sections with a product moment Iyz. In its strong
+    direction a wall stands on the rotational spring of its foundation; in its
+    weak direction it is taken as fixed, as the foundation stiffness is only
+    known about one axis. Walls without plan_y stand at the middle of the depth.
+    Returns a DiaphragmResult.
+    """
+    walls = bd.shearwalls
+    E = np.array([sw.E_wall for sw in walls], dtype=float)
+    cases, loads = story_loads(bd.width, bd.depth, bd.height, bd.no_stories, bd.pd_wind, eccentricity)
+    return solve_diaphragms(
+        x=[sw.insert_point for sw in walls],
+        y=[bd.depth / 2 if sw.plan_y is None else sw.plan_y for sw in walls],
+        angle=[sw.plan_angle + np.degrees(sw.alpha) for sw in walls],
+        k_strong=wall_stiffness(E, [sw.I1 for sw in walls], bd.height,
+                                [sw.foundation.foundation_stiffness for sw in walls]),
+        k_weak=wall_stiffness(E, [sw.I2 for sw in walls], bd.height),
+        loads=loads,
+        cases=cases,
+    )
+
+
+def wall_shares(result: DiaphragmResult) -> np.ndarray:
+    """
+    Function returns the share of the story shear of its load case taken by
+    every wall in its strong direction (projected on the wind direction), an
+    array (n_stories, n_cases, n_walls). Torsion can give negative shares.
+    """
+    V = result.loads[..., :2]
+    wind_angle = np.arctan2(V[..., 1], V[..., 0])
+    projection = np.cos(np.radians(result.angle) - wind_angle[..., None])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return result.forces_strong * projection / np.linalg.norm(V, axis=-1)[..., None]
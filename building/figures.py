@@ -0,0 +1,182 @@
+"""
+A module for managing the lifecycle of matplotlib figures.
+
+Figures are made with the object-oriented Figure API (not registered in
+pyplot's global figure list), rendered to PNG and recycled. Rendered images
+are kept in a cache capped by memory, shared by all sessions of a server.
+"""
+import hashlib
+import io
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class FigureManager:
+    """
+    Renders matplotlib figures to PNG bytes with a memory capped LRU cache.
+
+    - max_bytes : maximum size of the cached PNG images
+    - pool_size : amount of cleared Figure objects kept for reuse
+    """
+    def __init__(self, max_bytes: int = 32 * 2**20, pool_size: int = 2, dpi: int = 200):
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.dpi = dpi
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        self._pool = []
+        self._live = weakref.WeakSet()
+        self._lock = threading.RLock()
+
+
+    def render(self, key: str, draw: Callable[[Figure], None], size_inches: tuple = (7, 5)) -> bytes:
+        """
+        Returns the PNG image of the figure drawn by 'draw' on a (recycled)
+        Figure. Images are cached by 'key', so equal keys draw only once.
+        """
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            fig = self._acquire(size_inches)
+        try:
+            draw(fig)
+            png = figure_png(fig, dpi=self.dpi)
+        finally:
+            self._release(fig)
+        with self._lock:
+            self._store(key, png)
+        return png
+
+
+    def clear(self) -> None:
+        """
+        Empties the image cache and the pool of figures.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+            self._pool.clear()
+        return
+
+
+    def metrics(self) -> dict:
+        """
+        Returns the metrics of the manager and the process:
+
+        'cache_entries', 'cache_bytes'  : cached images and their size
+        'hits', 'misses', 'evictions'   : cache statistics
+        'live_figures'                  : Figures made by this manager still in memory
+        'pyplot_figures'                : figures registered in pyplot (should stay 0)
+        'rss_bytes'                     : resident memory of the process
+        """
+        with self._lock:
+            metrics = {
+                'cache_entries': len(self._cache),
+                'cache_bytes': self._cache_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'live_figures': len(self._live),
+                'pyplot_figures': pyplot_figure_count(),
+                'rss_bytes': rss_bytes(),
+            }
+        return metrics
+
+
+    def _acquire(self, size_inches: tuple) -> Figure:
+        if self._pool:
+            fig = self._pool.pop()
+        else:
+            fig = Figure()
+            FigureCanvasAgg(fig)
+            self._live.add(fig)
+        fig.set_size_inches(*size_inches)
+        return fig
+
+
+    def _release(self, fig: Figure) -> None:
+        fig.clear()
+        with self._lock:
+            if len(self._pool) < self.pool_size:
+                self._pool.append(fig)
+        return
+
+
+    def _store(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_bytes:
+            return
+        if key in self._cache:
+            self._cache_bytes -= len(self._cache.pop(key))
+        self._cache[key] = png
+        self._cache_bytes += len(png)
+        while self._cache_bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+            self.evictions += 1
+        return
+
+
+def figure_png(fig: Figure, dpi: int = 200) -> bytes:
+    """
+    Renders a matplotlib Figure to PNG bytes.
+    """
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def figure_key(*items) -> str:
+    """
+    Returns a cache key of the data of a figure. Arrays are hashed by content.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item in items:
+        if hasattr(item, 'tobytes'):
+            digest.update(str(getattr(item, 'shape', '')).encode())
+            digest.update(item.tobytes())
+        else:
+            digest.update(repr(item).encode())
+    return digest.hexdigest()
+
+
+def pyplot_figure_count() -> int:
+    """
+    Returns the amount of figures in pyplot's global registry (0 if pyplot was never imported).
+    """
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    if pyplot is None:
+        return 0
+    return len(pyplot.get_fignums())
+
+
+def rss_bytes() -> int:
+    """
+    Returns the resident memory of this process in bytes
+    (current on Linux, peak elsewhere).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+figure_manager = FigureManager()
@@ -2,9 +2,10 @@
 A module for designing a pile foundation
 """
 
+import numpy as np
 from plotly import graph_objects as go
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Union
 
 
 @dataclass
@@ -20,7 +21,10 @@ class Foundation:
     pile_grid_y: Optional[int] = None
     pile_no_x: Optional[int] = None
     pile_no_y: Optional[int] = None
+    pile_coords: Optional[np.ndarray] = None  # [[x, y],...] mm, overrides the pile grid
     foundation_stiffness: Optional[float] = None
+    pile_forces: Optional[np.ndarray] = None  # kN, compression positive
+    plot_pile_forces: Optional[go.Figure] = None
 
 
 def calculate_foundation(foundation: Foundation) -> Foundation:
@@ -28,6 +32,11 @@ def calculate_foundation(foundation: Foundation) -> Foundation:
     Takes a Foundation object and calculates the rotational stiffness.
     Returns the Foundation with added "foundation_stiffness" variable.
     """
+    if foundation.pile_coords is not None:
+        y_s = pile_coordinates(foundation)[:, 1] / 1000
+        y_s = y_s - y_s.mean()
+        foundation.foundation_stiffness = float(foundation.pile_stiffness * np.sum(y_s**2))
+        return foundation
     x_NA = 0.5 * (foundation.pile_no_y - 1) * foundation.pile_grid_y / 1000
     y_s = [-x_NA + foundation.pile_grid_y /1000 * i for i in range(foundation.pile_no_y)]
     k_pile = foundation.pile_stiffness # kN/m1
@@ -82,4 +91,99 @@ def plot_foundation(foundation: Foundation) -> Foundation:
     )
 
     foundation.plot_foundation = fig
-    return foundation
\ No newline at end of file
+    return foundation
+
+
+def pile_coordinates(foundation: Foundation) -> np.ndarray:
+    """
+    Takes a Foundation object and returns the (n, 2) array of pile coordinates
+    x, y in mm. These are 'pile_coords' when given, else the pile grid
+    centered on the wall in the same order as plot_foundation.
+    """
+    if foundation.pile_coords is not None:
+        return np.asarray(foundation.pile_coords, dtype=float).reshape(-1, 2)
+    h_2_x = 0.5 * (foundation.pile_no_x - 1) * foundation.pile_grid_x
+    h_2_y = 0.5 * (foundation.pile_no_y - 1) * foundation.pile_grid_y
+    rows = np.arange(foundation.pile_no_x) * foundation.pile_grid_x - h_2_x
+    cols = np.arange(foundation.pile_no_y) * foundation.pile_grid_y - h_2_y
+    x, y = np.meshgrid(rows, cols, indexing='ij')
+    return np.column_stack([x.ravel(), y.ravel()])
+
+
+def pile_forces(
+        coords: np.ndarray,
+        N: Union[float, np.ndarray],
+        M_x: Union[float, np.ndarray],
+        M_y: Union[float, np.ndarray] = 0.0,
+        ) -> np.ndarray:
+    """
+    Calculates the axial force in every pile of a rigid pile cap on piles of
+    equal stiffness, for one or many load cases at once.
+
+    coords  # (n_piles, 2) pile coordinates x, y in mm
+    N       # (n_cases,) vertical load in kN, compression positive
+    M_x     # (n_cases,) moment in kNm with lever arm y (as the wall's M_SecondOrder)
+    M_y     # (n_cases,) moment in kNm with lever arm x
+
+    Returns an (n_cases, n_piles) array of pile forces in kN, compression positive.
+    Moments about an axis without lever arm (e.g. a single row of piles) are not resisted.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2) / 1000
+    arms = coords - coords.mean(axis=0)
+    arms = arms[:, ::-1]  # [y, x]: lever arms of M_x and M_y
+    N, M_x, M_y = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (N, M_x, M_y)))
+    moments = np.column_stack([M_x, M_y])
+
+    # Linear distribution F_i = N / n + a * y_i + b * x_i in equilibrium with the moments
+    inertia = arms.T @ arms  # [[sum y2, sum xy], [sum xy, sum x2]]
+    distribution = np.linalg.pinv(inertia) @ arms.T  # (2, n_piles)
+    return N[:, None] / len(coords) + moments @ distribution
+
+
+def calculate_pile_forces(foundation: Foundation, N: float, M: float) -> Foundation:
+    """
+    Takes a Foundation object, the vertical load N (kN) and the moment M (kNm)
+    of its wall at groundlevel and calculates the axial force in every pile.
+    Returns the Foundation with added "pile_forces" variable.
+    """
+    foundation.pile_forces = pile_forces(pile_coordinates(foundation), N, M)[0]
+    return foundation
+
+
+def plot_pile_forces(foundation: Foundation) -> Foundation:
+    """
+    Takes a Foundation object with calculated pile forces and plots them as a
+    heat map in a single trace. Returns the Foundation with added "plot_pile_forces" variable.
+    """
+    coords = pile_coordinates(foundation)
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=coords[:, 0],
+        y=coords[:, 1],
+        mode='markers',
+        marker=dict(
+            symbol='square',
+            size=12,
+            color=foundation.pile_forces,
+            colorscale='RdBu_r',
+            cmid=0,
+            colorbar=dict(title='kN'),
+        ),
+        hovertemplate='x: %{x:.0f} mm<br>y: %{y:.0f} mm<br>F: %{marker.color:.0f} kN<extra></extra>',
+        )
+    )
+
+    fig.update_yaxes(
+        scaleanchor="x",
+        scaleratio=1,
+    )
+
+    fig.update_layout(
+        title = f'{foundation.label} - pile forces',
+        showlegend=False,
+        width=500,
+        height=600,
+    )
+
+    foundation.plot_pile_forces = fig
+    return foundation
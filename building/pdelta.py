@@ -0,0 +1,200 @@
+"""
+A module for the second order (P-delta) analysis of shearwalls with a section per story.
+
+A wall is a cantilever on a rotational spring (the foundation), discretized
+in beam elements per story, each story with its own bending stiffness. The
+lateral and axial loads act at the floor levels. The deflections follow
+directly from the elastic stiffness minus the (consistent) geometric
+stiffness of the axial force in every element:
+
+    (K - K_g) u = F
+
+a symmetric banded system (two degrees of freedom per node, three upper
+diagonals) solved with solveh_banded. The second order moments at the
+floor levels follow from equilibrium of the deformed wall. A wall loaded
+beyond its critical load has no positive definite K - K_g and is marked
+unstable (NaN results).
+
+The band matrices of many walls with the same amount of stories are
+assembled at once.
+"""
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import numpy as np
+from numpy.linalg import LinAlgError
+from scipy.linalg import solveh_banded
+from building.building import Building
+from building.shearwall import Shearwall, calculate_sections
+
+FIXED_SPRING = 1e9  # rotational spring of a fixed base, relative to the largest EI / l of the wall
+
+
+@dataclass
+class PDeltaResult:
+    """
+    Represents the first and second order results of walls at the floor levels.
+    """
+    z: np.ndarray  # (n_walls, n_stories + 1) floor levels (m), ground level first
+    deflection_first: np.ndarray  # (n_walls, n_stories + 1) first order deflection (m)
+    deflection: np.ndarray  # (n_walls, n_stories + 1) second order deflection (m)
+    drift: np.ndarray  # (n_walls, n_stories) second order story drift (m)
+    M_first: np.ndarray  # (n_walls, n_stories + 1) first order moment (kNm)
+    M_second: np.ndarray  # (n_walls, n_stories + 1) second order moment (kNm)
+    stable: np.ndarray  # (n_walls,) bool, loads below the critical load
+
+
+def element_matrices(EI: np.ndarray, L: np.ndarray, N: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Function returns the elastic and the consistent geometric stiffness
+    matrices (..., 4, 4) of beam elements (dofs w_i, theta_i, w_j, theta_j)
+    with bending stiffness EI (kNm2), length L (m) and axial compression N (kN).
+    """
+    L = np.asarray(L, dtype=float)[..., None, None]
+    one = np.ones_like(L)
+    K_e = np.asarray(EI, dtype=float)[..., None, None] / L**3 * np.block([
+        [12 * one, 6 * L, -12 * one, 6 * L],
+        [6 * L, 4 * L**2, -6 * L, 2 * L**2],
+        [-12 * one, -6 * L, 12 * one, -6 * L],
+        [6 * L, 2 * L**2, -6 * L, 4 * L**2],
+    ])
+    K_g = np.asarray(N, dtype=float)[..., None, None] / (30 * L) * np.block([
+        [36 * one, 3 * L, -36 * one, 3 * L],
+        [3 * L, 4 * L**2, -3 * L, -L**2],
+        [-36 * one, -3 * L, 36 * one, -3 * L],
+        [3 * L, -L**2, -3 * L, 4 * L**2],
+    ])
+    return (K_e, K_g)
+
+
+def band_matrix(k: np.ndarray, C_rot: np.ndarray) -> np.ndarray:
+    """
+    Function assembles element matrices k (n_walls, n_el, 4, 4) of walls
+    into the upper band form (n_walls, 4, n_dof) of solveh_banded. The dofs
+    are theta_0, w_1, theta_1, ... (w_0 = 0); theta_0 has the rotational
+    spring C_rot (n_walls,).
+    """
+    n_walls, n_el = k.shape[:2]
+    ab = np.zeros((n_walls, 4, 2 * n_el + 1))
+    dofs = 2 * np.arange(n_el)[:, None] + np.arange(4) - 1  # (n_el, 4), -1 for w_0
+    for a in range(4):
+        for b in range(a, 4):
+            keep = dofs[:, a] >= 0
+            ab[:, 3 + a - b, dofs[keep, b]] += k[:, keep, a, b]
+    ab[:, 3, 0] += C_rot
+    return ab
+
+
+def floor_moments(z: np.ndarray, w: np.ndarray, H: np.ndarray, P: np.ndarray) -> np.ndarray:
+    """
+    Function calculates the moments (n_walls, n_stories + 1) at the floor
+    levels z from the lateral loads H and axial loads P (n_walls, n_stories)
+    at the floors above, acting on the deflected wall w (zeros: first order).
+    """
+    above = np.triu(np.ones((z.shape[1], z.shape[1]), dtype=bool), k=1)[:, 1:]  # [level k, floor j] floor j above k
+    arm_H = z[:, None, 1:] - z[:, :, None]
+    arm_P = w[:, None, 1:] - w[:, :, None]
+    return np.sum(above * (H[:, None, :] * arm_H + P[:, None, :] * arm_P), axis=2)
+
+
+def solve_pdelta(
+    story_heights: np.ndarray,
+    EI: np.ndarray,
+    H: np.ndarray,
+    P: np.ndarray,
+    C_rot: np.ndarray,
+    segments: int = 2,
+    ) -> PDeltaResult:
+    """
+    Function solves walls with per story heights (m), bending stiffness EI
+    (kNm2), lateral loads H and axial loads P (kN) at the floor above the
+    story, all (n_walls, n_stories) or broadcastable, on a rotational spring
+    C_rot (n_walls,) kNm/rad (np.inf: fixed). Every story is divided in
+    'segments' beam elements.
+    Raises a ValueError for a non-positive EI or C_rot, which leaves the first
+    order system singular.
+    Returns a PDeltaResult.
+    """
+    EI = np.atleast_2d(np.asarray(EI, dtype=float))
+    shape = np.broadcast_shapes(EI.shape, np.shape(story_heights), np.shape(H), np.shape(P))
+    EI, h, H, P = (np.broadcast_to(np.asarray(values, dtype=float), shape) for values in (EI, story_heights, H, P))
+    n_walls, n_stories = shape
+    C_rot = np.broadcast_to(np.asarray(C_rot, dtype=float), (n_walls,))
+    for name, values in (('EI', EI), ('C_rot', C_rot)):
+        invalid = np.flatnonzero(~np.all(values.reshape(n_walls, -1) > 0, axis=1))
+        if len(invalid):
+            raise ValueError(f"{name} must be positive, walls {invalid.tolist()} are not")
+    C_rot = np.where(np.isinf(C_rot), FIXED_SPRING * np.max(EI / h, axis=1), C_rot)
+
+    # Elements: EI and length of their story, axial force of the floors above
+    EI_el = np.repeat(EI, segments, axis=1)
+    L_el = np.repeat(h / segments, segments, axis=1)
+    N_el = np.repeat(np.cumsum(P[:, ::-1], axis=1)[:, ::-1], segments, axis=1)
+    K_e, K_g = element_matrices(EI_el, L_el, N_el)
+    ab_first = band_matrix(K_e, C_rot)
+    ab_second = band_matrix(K_e - K_g, C_rot)
+
+    F = np.zeros((n_walls, ab_first.shape[2]))
+    F[:, 2 * segments * np.arange(1, n_stories + 1) - 1] = H
+    u_first = np.empty_like(F)
+    u_second = np.full_like(F, np.nan)
+    stable = np.ones(n_walls, dtype=bool)
+    for idx in range(n_walls):
+        u_first[idx] = solveh_banded(ab_first[idx], F[idx])
+        try:
+            u_second[idx] = solveh_banded(ab_second[idx], F[idx])
+        except LinAlgError:
+            stable[idx] = False
+
+    zeros = np.zeros((n_walls, 1))
+    z = np.hstack([zeros, np.cumsum(h, axis=1)])
+    w_first = np.hstack([zeros, u_first[:, 2 * segments - 1::2 * segments]])
+    w_second = np.hstack([zeros, u_second[:, 2 * segments - 1::2 * segments]])
+    return PDeltaResult(
+        z=z,
+        deflection_first=w_first,
+        deflection=w_second,
+        drift=np.diff(w_second, axis=1),
+        M_first=floor_moments(z, np.zeros_like(z), H, P),
+        M_second=np.where(stable[:, None], floor_moments(z, w_second, H, P), np.nan),
+        stable=stable,
+    )
+
+
+def story_stiffness(sw: Shearwall, sections: Optional[Sequence[Optional[dict]]], no_stories: int) -> np.ndarray:
+    """
+    Function calculates the bending stiffness EI (kNm2) of every story of a
+    shearwall. sections holds per story (ground floor first) the Shearwall
+    fields that differ from sw, e.g. {'web_width': 200} or a polygonal
+    'section_polygons'; missing or empty stories have the section of sw.
+    Returns an array (no_stories,).
+    """
+    sections = list(sections or [])
+    sections += [None] * (no_stories - len(sections))
+    stories = [dataclasses.replace(sw, **(section or {})) for section in sections[:no_stories]]
+    calculate_sections(stories)
+    return np.array([story.E_wall * story.Iy / 10**9 for story in stories])  # kNm2
+
+
+def building_pdelta(bd: Building, sections: Optional[list] = None, segments: int = 2) -> PDeltaResult:
+    """
+    Takes a Building with calculated shearwalls (sw.results) and solves
+    every wall per story: the governing UDL_tot as floor loads (a floor takes
+    half the story below and above it), N_vd_wall spread equally over the
+    floors and the foundation stiffness as rotational spring. sections[i]
+    holds the per story section changes of shearwall i (see story_stiffness).
+    Returns a PDeltaResult with a row per shearwall.
+    """
+    n = bd.no_stories
+    h_story = bd.height / n
+    tributary = np.full(n, h_story)
+    tributary[-1] = h_story / 2
+    sections = sections or [None] * len(bd.shearwalls)
+    return solve_pdelta(
+        story_heights=np.full(n, h_story),
+        EI=np.array([story_stiffness(sw, sections[idx], n) for idx, sw in enumerate(bd.shearwalls)]),
+        H=np.array([sw.results['UDL_tot'] for sw in bd.shearwalls])[:, None] * tributary,
+        P=np.array([sw.results['N_vd_wall'] / n for sw in bd.shearwalls])[:, None] * np.ones(n),
+        C_rot=np.array([sw.foundation.foundation_stiffness for sw in bd.shearwalls]),
+        segments=segments,
+    )
@@ -0,0 +1,342 @@
+"""
+A module for generating reports of many building scenarios.
+
+Every scenario is calculated and rendered to an HTML (MathJax) or PDF
+(pdflatex) report in a process pool, while the main process collects the
+summaries into a comparison table. The HTML reports carry their stylesheet
+inline; only MathJax is loaded from MATHJAX_URL (a CDN by default, point it to
+a local copy for offline use). Handcalculations of identical walls are
+rendered only once per worker process (the last CALCULATION_CACHE_SIZE).
+
+Usage:
+    python -m building.report scenarios.json reports/ --format html --workers 4
+"""
+import argparse
+import hashlib
+import html
+import json
+import shutil
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+import pandas as pd
+import pyarrow as pa
+from building import windbeam
+from building.building import Building
+from building.calculation import sw_calculation, sw_calculation_blocks
+from building.foundation import calculate_foundation, pile_coordinates
+from building.results import format_table, results_schema, results_table, write_results
+from building.session import input_key
+from building.shearwall import Shearwall, calc_geom_data, calculate_section
+
+
+DEFAULT_BUILDING = {
+    'width': 50.0,
+    'depth': 15.0,
+    'height': 20.0,
+    'no_stories': 5,
+    'N_vd': 250000,
+    'pd_wind': 1.0,
+    'no_shearwalls': 2,
+}
+DEFAULT_FOUNDATION = {
+    'pile_stiffness': 100000,
+    'pile_size': 300,
+    'pile_grid_x': 1500,
+    'pile_grid_y': 1500,
+    'pile_no_x': 2,
+    'pile_no_y': 4,
+}
+MATHJAX_URL = 'https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-chtml.js'
+STYLESHEET = """
+body { font-family: sans-serif; max-width: 60em; margin: 2em auto; color: #222; }
+h1 { border-bottom: 2px solid royalblue; }
+h2 { color: royalblue; margin-top: 2em; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.75em; text-align: right; }
+th { background: #eef; }
+hr { border: 0; border-top: 1px solid #ddd; }
+"""
+HTML_HEAD = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>{stylesheet}</style>
+<script>MathJax = {{tex: {{inlineMath: [['$', '$']]}}}};</script>
+<script async src="{mathjax}"></script>
+</head>
+<body>
+"""
+HTML_FOOT = """</body>
+</html>
+"""
+TEX_PREAMBLE = r"""\documentclass[a4paper,10pt]{article}
+\usepackage[margin=2cm]{geometry}
+\usepackage{amsmath}
+\begin{document}
+"""
+TEX_END = r"""\end{document}
+"""
+
+CALCULATION_CACHE_SIZE = 256  # handcalculations kept per process
+
+_calculation_cache = OrderedDict()
+
+
+@dataclass
+class Scenario:
+    """
+    Represents a building variant to report on. Every dict holds field values
+    overriding the defaults of Building, Shearwall (per wall) and Foundation (per wall).
+    """
+    name: str = 'name'
+    building: Optional[dict] = None
+    shearwalls: Optional[list] = None
+    foundations: Optional[list] = None
+
+
+def run_scenario(scenario: Scenario) -> Building:
+    """
+    Takes a Scenario and calculates the building, its shearwalls, foundations,
+    windbeam (not plotted, the reports hold no plots) and handcalculations.
+    Returns the Building.
+    """
+    bd = prepare_scenario(scenario, plot=False)
+    for sw in bd.shearwalls:
+        cached_sw_calculation(sw, bd)
+    return bd
+
+
+def prepare_scenario(scenario: Scenario, plot: bool = True) -> Building:
+    """
+    Takes a Scenario and calculates the building, its shearwalls, foundations
+    and windbeam (plotted unless plot is False). Returns the Building.
+    """
+    bd = Building(**{**DEFAULT_BUILDING, **(scenario.building or {})})
+    bd.initialize_data()
+    for idx, sw in enumerate(bd.shearwalls):
+        for name, value in _item(scenario.shearwalls, idx).items():
+            setattr(sw, name, value)
+        calculate_section(sw)
+        calc_geom_data(sw)
+        for name, value in {**DEFAULT_FOUNDATION, **_item(scenario.foundations, idx)}.items():
+            setattr(sw.foundation, name, value)
+        calculate_foundation(sw.foundation)
+
+    return windbeam.floor(bd, plot=plot)
+
+
+def cached_sw_calculation(sw: Shearwall, bd: Building) -> Shearwall:
+    """
+    Function makes the handcalculation of a shearwall, reusing the rendered
+    results of an identical wall calculated recently in this process.
+    """
+    fd = sw.foundation
+    key = input_key(
+        bd.width, bd.height, bd.N_vd, bd.pd_wind, bd.load_combos, bd.exact_buckling, sw.windshares,
+        sw.E_wall, sw.Iy, fd.foundation_stiffness,
+        hashlib.blake2b(pile_coordinates(fd).tobytes(), digest_size=16).hexdigest(),
+    )
+    if key not in _calculation_cache:
+        sw_calculation(sw, bd)
+        _calculation_cache[key] = (sw.results, sw.results_latex, sw.M_combos, fd.pile_forces)
+        while len(_calculation_cache) > CALCULATION_CACHE_SIZE:
+            _calculation_cache.popitem(last=False)
+    _calculation_cache.move_to_end(key)
+    sw.results, sw.results_latex, sw.M_combos, fd.pile_forces = _calculation_cache[key]
+    return sw
+
+
+def summary_table(bd: Building) -> pd.DataFrame:
+    """
+    Returns the SUMMARY table of a calculated building (results x shearwalls).
+    """
+    return format_table(results_table(bd.shearwalls))
+
+
+def render_html(name: str, bd: Building) -> str:
+    """
+    Renders the handcalculations and SUMMARY of a calculated building as HTML.
+    """
+    parts = [HTML_HEAD.format(title=html.escape(name), stylesheet=STYLESHEET, mathjax=MATHJAX_URL)]
+    parts.append(f'<h1>{html.escape(name)}</h1>\n')
+    parts.append(f'<p>{html.escape(_building_description(bd))}</p>\n')
+    for sw in bd.shearwalls:
+        parts.append(f'<h2>{html.escape(sw.label)}</h2>\n')
+        for kind, content in sw_calculation_blocks(sw):
+            if kind == 'subheader':
+                parts.append(f'<h3>{html.escape(content)}</h3>\n')
+            elif kind == 'text':
+                parts.append(f'<p>{html.escape(content)}</p>\n')
+            elif kind == 'latex':
+                parts.append(f'<div>\\[{html.escape(content)}\\]</div>\n')
+            else:
+                parts.append('<hr>\n')
+    parts.append('<h2>SUMMARY</h2>\n')
+    parts.append(summary_table(bd).to_html())
+    parts.append(HTML_FOOT)
+    return ''.join(parts)
+
+
+def render_tex(name: str, bd: Building) -> str:
+    """
+    Renders the handcalculations and SUMMARY of a calculated building as a LaTeX document.
+    """
+    parts = [TEX_PREAMBLE, f'\\section*{{{_tex_escape(name)}}}\n']
+    parts.append(f'{_tex_escape(_building_description(bd))}\n\n')
+    for sw in bd.shearwalls:
+        parts.append(f'\\subsection*{{{_tex_escape(sw.label)}}}\n')
+        for kind, content in sw_calculation_blocks(sw):
+            if kind == 'subheader':
+                parts.append(f'\\subsubsection*{{{_tex_escape(content)}}}\n')
+            elif kind == 'text':
+                parts.append(f'{_tex_escape(content, math=True)}\n\n')
+            elif kind == 'latex':
+                parts.append(f'\\[{content}\\]\n')
+            else:
+                parts.append('\\medskip\\hrule\\medskip\n')
+    table = summary_table(bd)
+    parts.append('\\subsection*{SUMMARY}\n')
+    parts.append(f'\\begin{{tabular}}{{l{"r" * len(table.columns)}}}\n')
+    parts.append(' & '.join([''] + [_tex_escape(col) for col in table.columns]) + ' \\\\ \\hline\n')
+    for label, row in table.iterrows():
+        parts.append(' & '.join([_tex_escape(label)] + [_tex_escape(str(value)) for value in row]) + ' \\\\\n')
+    parts.append('\\end{tabular}\n')
+    parts.append(TEX_END)
+    return ''.join(parts)
+
+
+def build_report(scenario: Scenario, out_dir: Path, fmt: str = 'html') -> pa.Table:
+    """
+    Calculates a scenario and writes its report to out_dir.
+    Returns the results table (one row per shearwall) of the scenario.
+    """
+    bd = run_scenario(scenario)
+    stem = out_dir / _file_name(scenario.name)
+    if fmt == 'html':
+        stem.with_suffix('.html').write_text(render_html(scenario.name, bd), encoding='utf-8')
+    elif fmt == 'pdf':
+        write_pdf(render_tex(scenario.name, bd), stem)
+    else:
+        raise ValueError(f"Unknown report format '{fmt}', use 'html' or 'pdf'")
+
+    return results_table(bd.shearwalls, Scenario=scenario.name)
+
+
+def write_pdf(tex: str, stem: Path) -> None:
+    """
+    Writes a LaTeX document next to stem and compiles it to PDF with pdflatex.
+    """
+    pdflatex = shutil.which('pdflatex')
+    if pdflatex is None:
+        raise RuntimeError("pdflatex not found, PDF reports need a LaTeX installation")
+    tex_file = stem.with_suffix('.tex')
+    tex_file.write_text(tex, encoding='utf-8')
+    subprocess.run(
+        [pdflatex, '-interaction=nonstopmode', '-halt-on-error', tex_file.name],
+        cwd=tex_file.parent, check=True, capture_output=True,
+    )
+    return
+
+
+def generate_reports(
+        scenarios: Iterable[Scenario],
+        out_dir: str,
+        fmt: str = 'html',
+        workers: Optional[int] = None,
+        ) -> pd.DataFrame:
+    """
+    Generates the reports of all scenarios in out_dir, in a pool of worker
+    processes (workers=1 runs in this process). Writes the comparison table
+    of all scenarios and shearwalls as Parquet (numeric, with units), CSV
+    (numeric) and HTML (formatted); returns it as a numeric DataFrame.
+    """
+    scenarios = list(scenarios)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if workers == 1:
+        tables = [build_report(scenario, out_dir, fmt) for scenario in scenarios]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(build_report, scenario, out_dir, fmt) for scenario in scenarios]
+            tables = [future.result() for future in futures]
+
+    table = pa.concat_tables(tables) if tables else results_schema(['Scenario', 'Shearwall']).empty_table()
+    write_results(table, out_dir / 'comparison.parquet')
+    comparison = table.to_pandas().set_index(['Scenario', 'Shearwall'])
+    comparison.to_csv(out_dir / 'comparison.csv')
+    display = format_table(table, ['Scenario', 'Shearwall']).transpose()
+    (out_dir / 'comparison.html').write_text(
+        HTML_HEAD.format(title='Comparison', stylesheet=STYLESHEET, mathjax=MATHJAX_URL)
+        + '<h1>Comparison</h1>\n' + display.to_html() + HTML_FOOT,
+        encoding='utf-8',
+    )
+    return comparison
+
+
+def load_scenarios(path: str) -> list[Scenario]:
+    """
+    Loads scenarios from a JSON file with a list of Scenario fields.
+    """
+    with open(path, encoding='utf-8') as file:
+        return [Scenario(**item) for item in json.load(file)]
+
+
+def _item(items: Optional[list], idx: int) -> dict:
+    if items is None or idx >= len(items):
+        return {}
+    return items[idx] or {}
+
+
+def _building_description(bd: Building) -> str:
+    return (
+        f'Building {bd.width} x {bd.depth} x {bd.height} m, {bd.no_stories} stories, '
+        f"{bd.no_shearwalls} shearwalls, N'vd = {bd.N_vd} kN, pd_wind = {bd.pd_wind} kN/m2"
+    )
+
+
+def _file_name(name: str) -> str:
+    return ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
+
+
+def _tex_escape(text: str, math: bool = False) -> str:
+    """
+    Escapes LaTeX special characters; with math=True inline $...$ math is kept.
+    """
+    text = str(text)
+    chars = {'%': r'\%', '&': r'\&', '#': r'\#', '_': r'\_'}
+    if not math:
+        chars['$'] = r'\$'
+        chars['{'] = r'\{'
+        chars['}'] = r'\}'
+    out = []
+    in_math = False
+    for char in text:
+        if math and char == '$':
+            in_math = not in_math
+            out.append(char)
+        elif char in chars and not in_math:
+            out.append(chars[char])
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate shearwall reports for many building scenarios.")
+    parser.add_argument('scenarios', help="JSON file with a list of scenarios")
+    parser.add_argument('out_dir', help="Output directory")
+    parser.add_argument('--format', default='html', choices=['html', 'pdf'])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    comparison = generate_reports(load_scenarios(args.scenarios), args.out_dir, args.format, args.workers)
+    print(comparison.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+A module for the numeric results of shearwall calculations.
+
+The results of a shearwall are typed values (floats, and strings for the
+names of the governing combination and the critical load). Results of many
+shearwalls form an Arrow table with the unit and display format of every
+column in its field metadata. Tables of many scenarios can be concatenated
+without copying and written to Parquet or Arrow files. Values are only
+formatted for display.
+"""
+import io
+from pathlib import Path
+from typing import Sequence, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+from building.shearwall import Shearwall
+
+RESULT_SCHEMA = {
+    # name: (Arrow type, unit, display format)
+    'Governing': (pa.string(), '', '{}'),
+    'Windshare': (pa.float64(), '-', '{:.2%}'),
+    'UDL_wind': (pa.float64(), 'kN/m1', '{:.2f} kN/m1'),
+    'UDL_lean': (pa.float64(), 'kN/m1', '{:.2f} kN/m1'),
+    'UDL_tot': (pa.float64(), 'kN/m1', '{:.2f} kN/m1'),
+    'C_rot': (pa.float64(), 'kNm/rad', '{:.3e} kNm/rad'),
+    'N_vd_wall': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_k1': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_k2': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_ktot': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_kexact': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_kcr': (pa.string(), '', '{}'),
+    'n_value': (pa.float64(), '-', '{:.3f}'),
+    'SecondOrderEffect': (pa.float64(), '-', '{:.2%}'),
+    'M_SecondOrder': (pa.float64(), 'kNm', '{:.0f} kNm'),
+    'F_pile_max': (pa.float64(), 'kN', '{:.0f} kN'),
+    'F_pile_min': (pa.float64(), 'kN', '{:.0f} kN'),
+}
+
+
+def format_result(name: str, value) -> str:
+    """
+    Returns the display string of a result value.
+    """
+    return RESULT_SCHEMA[name][2].format(value)
+
+
+def results_schema(labels: Sequence[str] = ('Shearwall',)) -> pa.Schema:
+    """
+    Returns the Arrow schema of a results table: string label columns followed
+    by the result columns with their 'unit' and 'format' as field metadata.
+    """
+    fields = [pa.field(label, pa.string()) for label in labels]
+    for name, (dtype, unit, fmt) in RESULT_SCHEMA.items():
+        fields.append(pa.field(name, dtype, metadata={'unit': unit, 'format': fmt}))
+    return pa.schema(fields)
+
+
+def results_table(walls: Sequence[Shearwall], **labels: str) -> pa.Table:
+    """
+    Takes calculated Shearwalls and returns their results as an Arrow table,
+    one row per shearwall. Keyword arguments add constant label columns in
+    front (e.g. Scenario='base').
+    """
+    schema = results_schema(list(labels) + ['Shearwall'])
+    columns = [[value] * len(walls) for value in labels.values()]
+    columns.append([sw.label for sw in walls])
+    columns += [[sw.results[name] for sw in walls] for name in RESULT_SCHEMA]
+    return pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+
+def units(table: pa.Table) -> dict[str, str]:
+    """
+    Returns the unit of every result column of a results table.
+    """
+    return {
+        field.name: field.metadata[b'unit'].decode()
+        for field in table.schema if field.metadata and b'unit' in field.metadata
+    }
+
+
+def format_table(table: pa.Table, index: Union[str, list[str]] = 'Shearwall') -> pd.DataFrame:
+    """
+    Returns the display table of a results table: the formatted results
+    (rows) of every row of the table (columns), labelled by the index column(s).
+    """
+    formatted = {}
+    for field in table.schema:
+        values = table.column(field.name).to_pylist()
+        if field.metadata and b'format' in field.metadata:
+            fmt = field.metadata[b'format'].decode()
+            values = [fmt.format(value) for value in values]
+        formatted[field.name] = values
+    df = pd.DataFrame(formatted).set_index(index)
+    return df.drop(columns=[col for col in df.columns if col not in RESULT_SCHEMA]).transpose()
+
+
+def write_results(table: pa.Table, target: Union[str, Path, io.IOBase], fmt: str = 'parquet') -> None:
+    """
+    Writes a results table (with its units) to a file or buffer, as 'parquet'
+    or 'arrow' (Arrow IPC / Feather V2).
+    """
+    if fmt == 'parquet':
+        pq.write_table(table, target)
+    elif fmt == 'arrow':
+        feather.write_feather(table, target)
+    else:
+        raise ValueError(f"Unknown results format '{fmt}', use 'parquet' or 'arrow'")
+    return
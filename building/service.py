@@ -0,0 +1,408 @@
+"""
+A module with a local JSON calculation service over the shearwall core.
+
+Endpoints (POST, JSON body; GET /health and /metrics):
+
+    /section     : section properties of an I/T section or polygon section
+    /foundation  : rotational stiffness and pile forces of a pile foundation
+    /windbeam    : support reactions and My/Vz extremes of a windbeam
+    /windshare   : windshares of walls (surrogate estimate or exact solve)
+    /shearwall   : numeric shearwall calculation of a building scenario
+
+Concurrent requests per endpoint are coalesced into batches, which are
+calculated vectorized by a pool of workers. A result cache sits in front.
+The service only listens on the loopback interface.
+
+Usage:
+    python -m building.service --port 8765 --workers 4
+"""
+import argparse
+import ipaddress
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional
+import numpy as np
+from building import surrogate, windbeam
+from building.calculation import sw_calculation_values
+from building.foundation import Foundation, calculate_foundation, pile_coordinates, pile_forces
+from building.report import DEFAULT_FOUNDATION, Scenario, prepare_scenario
+from building.shearwall import Shearwall, section_polygons, section_properties
+
+
+class Batcher:
+    """
+    Collects submitted payloads and calculates them in batches of at most
+    max_batch items, waiting at most max_wait seconds for a batch to fill.
+    'calculate' takes a list of payloads and returns a list of results.
+    """
+    def __init__(
+            self,
+            calculate: Callable[[list], list],
+            pool: ThreadPoolExecutor,
+            max_batch: int = 64,
+            max_wait: float = 0.002,
+            ):
+        self.calculate = calculate
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._collect, daemon=True)
+        self._thread.start()
+
+
+    def submit(self, payload: Any) -> Future:
+        """
+        Submits a payload; returns a Future of its result.
+        """
+        future = Future()
+        self._queue.put((payload, future))
+        return future
+
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self.batches += 1
+            self.items += len(batch)
+            self.pool.submit(self._run, batch)
+
+
+    def _run(self, batch: list) -> None:
+        payloads = [payload for payload, _ in batch]
+        try:
+            results = self.calculate(payloads)
+        except Exception:
+            # Calculate one by one so a bad payload only fails its own request
+            results = []
+            for payload in payloads:
+                try:
+                    results.append(self.calculate([payload])[0])
+                except Exception as error:
+                    results.append(error)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        return
+
+
+class ResultCache:
+    """
+    Thread safe LRU cache of results, keyed by endpoint and canonical JSON payload.
+    """
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+            return None
+
+
+    def put(self, key: str, result: Any) -> None:
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return
+
+
+def calculate_sections(payloads: list[dict]) -> list[dict]:
+    """
+    Section properties of a batch of sections in one vectorized call. A payload
+    holds 'polygons' (and 'openings') in mm, or Shearwall I/T section fields.
+    """
+    sections = []
+    for payload in payloads:
+        if 'polygons' in payload:
+            sections.append((payload['polygons'], payload.get('openings') or []))
+        else:
+            sections.append(section_polygons(Shearwall(**payload)))
+    props = section_properties(sections)
+    return [{name: float(values[idx]) for name, values in props.items()} for idx in range(len(payloads))]
+
+
+def calculate_foundations(payloads: list[dict]) -> list[dict]:
+    """
+    Rotational stiffness and pile forces of a batch of foundations. A payload
+    holds Foundation fields (overriding the report defaults) and optional
+    load cases 'N' and 'M' (kN, kNm).
+    """
+    results = []
+    for payload in payloads:
+        loads = {name: payload[name] for name in ('N', 'M') if name in payload}
+        fields = {name: value for name, value in payload.items() if name not in loads}
+        if fields.get('pile_coords') is not None:
+            fields['pile_coords'] = np.asarray(fields['pile_coords'], dtype=float)
+        fd = Foundation(**{**DEFAULT_FOUNDATION, **fields})
+        fd = calculate_foundation(fd)
+        result = {'foundation_stiffness': float(fd.foundation_stiffness)}
+        if loads:
+            forces = pile_forces(pile_coordinates(fd), loads.get('N', 0.0), loads.get('M', 0.0))
+            result['pile_forces'] = forces.tolist()
+        results.append(result)
+    return results
+
+
+def calculate_windbeams(payloads: list[dict]) -> list[dict]:
+    """
+    Windbeam results of a batch. A payload holds 'supports' (x positions in m),
+    'width' (m) and 'udls' (kN/m1, one per load combination). Payloads with
+    the same geometry are solved together with one factorization.
+    """
+    groups = {}
+    for idx, payload in enumerate(payloads):
+        geometry = (tuple(float(x) for x in payload['supports']), float(payload['width']))
+        groups.setdefault(geometry, []).append(idx)
+
+    results = [None] * len(payloads)
+    for (supports, width), idxs in groups.items():
+        udls = [np.atleast_1d(np.asarray(payloads[idx]['udls'], dtype=float)) for idx in idxs]
+        nodes = sorted(set(supports) | {0.0, width})
+        reactions, x, My, Vz = windbeam.solve_windbeam(list(supports), nodes, np.concatenate(udls))
+        start = 0
+        for idx, udl in zip(idxs, udls):
+            part = slice(start, start + len(udl))
+            start += len(udl)
+            results[idx] = {
+                'reactions': reactions[part].tolist(),
+                'My_max': My[part].max(axis=1).tolist(),
+                'My_min': My[part].min(axis=1).tolist(),
+                'Vz_max': Vz[part].max(axis=1).tolist(),
+                'Vz_min': Vz[part].min(axis=1).tolist(),
+            }
+    return results
+
+
+def calculate_windshares(payloads: list[dict]) -> list[dict]:
+    """
+    Windshares of a batch. A payload holds 'insert_points' and 'width' (m) and
+    an optional 'tolerance'. Payloads with the same amount of walls and
+    tolerance are estimated together with the surrogate.
+    """
+    groups = {}
+    for idx, payload in enumerate(payloads):
+        key = (len(payload['insert_points']), float(payload.get('tolerance', surrogate.TOLERANCE)))
+        groups.setdefault(key, []).append(idx)
+
+    results = [None] * len(payloads)
+    for (_, tolerance), idxs in groups.items():
+        shares, errors, exact = surrogate.windshares(
+            [payloads[idx]['insert_points'] for idx in idxs],
+            [payloads[idx]['width'] for idx in idxs],
+            tolerance,
+        )
+        for row, idx in enumerate(idxs):
+            results[idx] = {
+                'windshares': shares[row].tolist(),
+                'error_bound': float(errors[row]),
+                'exact': bool(exact[row]),
+            }
+    return results
+
+
+def calculate_shearwalls(payloads: list[dict]) -> list[dict]:
+    """
+    Numeric shearwall calculation of a batch of building scenarios (Scenario
+    fields). All walls of the batch are calculated in one vectorized pass.
+    """
+    buildings = [prepare_scenario(Scenario(**payload), plot=False) for payload in payloads]
+    walls = [sw for bd in buildings for sw in bd.shearwalls]
+    owners = [bd for bd in buildings for _ in bd.shearwalls]
+    values = sw_calculation_values(walls, owners)
+
+    results = []
+    start = 0
+    for bd in buildings:
+        wall_values = values[start:start + len(bd.shearwalls)]
+        for sw, value in zip(bd.shearwalls, wall_values):
+            forces = pile_forces(pile_coordinates(sw.foundation), value['N_vd_wall'], value['M_SecondOrder'])
+            value['F_pile_max'] = float(forces.max())
+            value['F_pile_min'] = float(forces.min())
+            value['label'] = sw.label
+        start += len(bd.shearwalls)
+        results.append({
+            'floor_reactions': bd.floor_combo_reactions.tolist(),
+            'load_combos': list(bd.load_combos),
+            'shearwalls': wall_values,
+        })
+    return results
+
+
+ENDPOINTS = {
+    '/section': calculate_sections,
+    '/foundation': calculate_foundations,
+    '/windbeam': calculate_windbeams,
+    '/windshare': calculate_windshares,
+    '/shearwall': calculate_shearwalls,
+}
+
+
+# Errors of a calculation caused by its payload (LinAlgError is a ValueError)
+BAD_INPUT = (ValueError, TypeError, KeyError, IndexError, ArithmeticError)
+
+
+class CalculationService:
+    """
+    Holds the worker pool, a Batcher per endpoint and the result cache.
+    """
+    def __init__(self, workers: int = 4, max_batch: int = 64, max_wait: float = 0.002, cache_entries: int = 4096):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.batchers = {
+            path: Batcher(calculate, self.pool, max_batch=max_batch, max_wait=max_wait)
+            for path, calculate in ENDPOINTS.items()
+        }
+        self.cache = ResultCache(cache_entries)
+        self.requests = 0
+
+
+    def handle(self, path: str, payload: Any, timeout: float = 60.0) -> Any:
+        """
+        Returns the (cached) result of a payload for an endpoint.
+        """
+        self.requests += 1
+        key = path + json.dumps(payload, sort_keys=True)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.batchers[path].submit(payload).result(timeout=timeout)
+            self.cache.put(key, result)
+        return result
+
+
+    def metrics(self) -> dict:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'batches': {path: batcher.batches for path, batcher in self.batchers.items()},
+            'batched_items': {path: batcher.items for path, batcher in self.batchers.items()},
+        }
+
+
+def make_handler(service: CalculationService) -> type:
+    """
+    Returns a request handler class serving the endpoints of service.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self) -> None:
+            if not self._local_client():
+                return
+            if self.path == '/health':
+                self._send(200, {'status': 'ok'})
+            elif self.path == '/metrics':
+                self._send(200, service.metrics())
+            else:
+                self._send(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self) -> None:
+            if not self._local_client():
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                if length < 0:
+                    raise ValueError(f'Content-Length must not be negative, got {length}')
+            except ValueError as error:
+                self.close_connection = True  # the body can not be skipped
+                self._send(400, {'error': f'{type(error).__name__}: {error}'})
+                return
+            body = self.rfile.read(length)
+            if self.path not in ENDPOINTS:
+                self._send(404, {'error': f'Unknown path {self.path}'})
+                return
+            try:
+                payload = json.loads(body or b'{}')
+                result = service.handle(self.path, payload)
+            except BAD_INPUT as error:
+                self._send(400, {'error': f'{type(error).__name__}: {error}'})
+                return
+            except Exception as error:
+                self._send(500, {'error': f'{type(error).__name__}: {error}'})
+                return
+            self._send(200, result)
+
+        def log_message(self, format: str, *args) -> None:
+            return
+
+        def _local_client(self) -> bool:
+            if ipaddress.ip_address(self.client_address[0]).is_loopback:
+                return True
+            self._send(403, {'error': 'Only local clients are served'})
+            return False
+
+        def _send(self, status: int, data: Any) -> None:
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+class CalculationServer(ThreadingHTTPServer):
+    """
+    Threading HTTP server with a listen backlog sized for concurrent clients.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_server(host: str = '127.0.0.1', port: int = 8765, **kwargs) -> CalculationServer:
+    """
+    Returns an HTTP server of a new CalculationService (kwargs) on a loopback address.
+    """
+    if not ipaddress.ip_address(host).is_loopback:
+        raise ValueError(f"The calculation service only runs on localhost, got host '{host}'")
+    service = CalculationService(**kwargs)
+    server = CalculationServer((host, port), make_handler(service))
+    server.service = service
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local JSON calculation service for shearwalls.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, default=0.002, help="seconds to wait for a batch to fill")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, workers=args.workers,
+                         max_batch=args.max_batch, max_wait=args.max_wait)
+    print(f"Serving on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+A load-test script for the local calculation service.
+
+Sends requests from concurrent clients and reports throughput and p50/p99
+latency per endpoint. Starts its own service unless --url is given.
+
+Usage:
+    python -m building.service_loadtest --requests 2000 --concurrency 32
+    python -m building.service_loadtest --url http://127.0.0.1:8765 --unique 0.5
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from building.service import make_server
+
+
+def make_payload(endpoint: str, rng: random.Random, unique: float) -> dict:
+    """
+    Returns a request payload for an endpoint. A fraction 'unique' of the
+    payloads is varied, the rest repeats the default inputs (cache hits).
+    """
+    vary = rng.random() < unique
+    if endpoint == '/section':
+        return {'web_height': rng.randrange(3000, 8000, 50) if vary else 5000}
+    if endpoint == '/foundation':
+        return {'pile_no_y': rng.randrange(2, 8) if vary else 4, 'N': 5000.0, 'M': 12000.0}
+    if endpoint == '/windbeam':
+        supports = [0.0, float(rng.randrange(10, 50)) if vary else 50.0]
+        return {'supports': supports, 'width': 50.0, 'udls': [4.0, -4.0]}
+    return {
+        'name': 'loadtest',
+        'building': {'pd_wind': round(rng.uniform(0.5, 1.5), 2) if vary else 1.0},
+    }
+
+
+def post(url: str, payload: dict) -> float:
+    """
+    Posts a JSON payload; returns the latency in seconds.
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def load_test(base_url: str, endpoints: list, requests: int, concurrency: int, unique: float, seed: int = 0) -> dict:
+    """
+    Runs the load test; returns per endpoint the requests, errors, throughput
+    (requests/s) and the p50/p99 latency (ms).
+    """
+    rng = random.Random(seed)
+    jobs = [(endpoint, make_payload(endpoint, rng, unique)) for endpoint in endpoints for _ in range(requests)]
+    rng.shuffle(jobs)
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    lock = threading.Lock()
+
+    def run(job: tuple) -> None:
+        endpoint, payload = job
+        try:
+            latency = post(base_url + endpoint, payload)
+        except OSError:
+            with lock:
+                errors[endpoint] += 1
+            return
+        with lock:
+            latencies[endpoint].append(latency)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(run, jobs))
+    duration = time.perf_counter() - start
+
+    report = {}
+    for endpoint in endpoints:
+        ms = np.array(latencies[endpoint]) * 1000
+        report[endpoint] = {
+            'requests': len(ms) + errors[endpoint],
+            'errors': errors[endpoint],
+            'throughput': len(ms) / duration,
+            'p50_ms': float(np.percentile(ms, 50)) if len(ms) else float('nan'),
+            'p99_ms': float(np.percentile(ms, 99)) if len(ms) else float('nan'),
+        }
+    report['total'] = {'requests': len(jobs), 'duration_s': duration, 'throughput': len(jobs) / duration}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the local calculation service.")
+    parser.add_argument('--url', default=None, help="service to test (default: start one on a free port)")
+    parser.add_argument('--endpoints', nargs='+', default=['/section', '/foundation', '/windbeam', '/shearwall'])
+    parser.add_argument('--requests', type=int, default=500, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--unique', type=float, default=1.0, help="fraction of varied payloads")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = make_server(port=0, workers=args.workers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    report = load_test(base_url, args.endpoints, args.requests, args.concurrency, args.unique)
+    print(f"{'endpoint':<12}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for endpoint in args.endpoints:
+        r = report[endpoint]
+        print(f"{endpoint:<12}{r['requests']:>10}{r['errors']:>8}{r['throughput']:>10.1f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+    total = report['total']
+    print(f"total {total['requests']} requests in {total['duration_s']:.2f} s ({total['throughput']:.1f} req/s)")
+    if server is not None:
+        print(json.dumps(server.service.metrics()))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+A module for keeping the app models in the session state
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, MutableMapping, Optional
+from building.building import Building
+
+
+@dataclass
+class SessionModel:
+    """
+    Represents the models of an app session. Every calculation step stores the
+    key of its inputs, so a rerun only recomputes the steps whose inputs changed.
+    """
+    building: Optional[Building] = None
+    keys: dict = field(default_factory=dict)
+    recomputed: list = field(default_factory=list)
+    in_app_run: bool = False
+    run_start: float = 0.0
+    rerun_ms: float = 0.0
+
+
+def get_model(state: MutableMapping, name: str = 'model') -> SessionModel:
+    """
+    Returns the SessionModel stored in the session state, creating it on first use.
+    """
+    if name not in state:
+        state[name] = SessionModel()
+    return state[name]
+
+
+def begin_run(model: SessionModel) -> None:
+    """
+    Marks the start of a full app run.
+    """
+    model.in_app_run = True
+    model.run_start = time.perf_counter()
+    model.recomputed = []
+    return
+
+
+def end_run(model: SessionModel) -> None:
+    """
+    Marks the end of a full app run and records its duration in 'rerun_ms'.
+    """
+    model.in_app_run = False
+    model.rerun_ms = (time.perf_counter() - model.run_start) * 1000
+    return
+
+
+def input_key(*inputs: Any) -> str:
+    """
+    Returns the key of the inputs of a calculation step.
+    Inputs are expected to be (nested tuples, lists, dicts of) plain values.
+    """
+    return repr(inputs)
+
+
+def changed(model: SessionModel, step: str, *inputs: Any) -> bool:
+    """
+    Returns True when the inputs of a calculation step differ from the previous run
+    and stores the new key. The step is then recorded in 'recomputed'.
+    """
+    key = input_key(*inputs)
+    if model.keys.get(step) == key:
+        return False
+    model.keys[step] = key
+    model.recomputed.append(step)
+    return True
+
+
+def reset(model: SessionModel, building: Building) -> None:
+    """
+    Replaces the building of a SessionModel and forgets all calculation steps.
+    """
+    model.building = building
+    model.keys = {key: value for key, value in model.keys.items() if key == 'building'}
+    return
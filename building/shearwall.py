@@ -2,9 +2,9 @@
 A module for designing concrete shearwalls.
 """
 
-import pandas as pd
+import numpy as np
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional, Sequence, Tuple
 from plotly import graph_objects as go
 from building.building_plot import expand_geom_data
 from building.foundation import Foundation
@@ -25,27 +25,40 @@ class Shearwall:
     bot_flange_height: int = 250  # mm
     aligned: str = 'left'  # 'left', 'center' or 'right'
     height: float = 25.0  # m
+    no_stories: int = 1  # amount
     insert_point: Optional[float] = None
+    plan_y: Optional[float] = None  # m, position across the building depth (None: middle)
+    plan_angle: float = 90.0  # degrees, strong axis (web) to the x axis of the plan
+    section_polygons: Optional[list] = None  # [[[x, y], ...], ...] mm, solid parts
+    section_openings: Optional[list] = None  # [[[x, y], ...], ...] mm, openings
     A: Optional[float] = None
     Iy: Optional[float] = None
+    Iz: Optional[float] = None
+    Iyz: Optional[float] = None
+    I1: Optional[float] = None
+    I2: Optional[float] = None
+    alpha: Optional[float] = None
     h: Optional[float] = None
     e_top: Optional[float] = None
     e_bot: Optional[float] = None
     plot_section: Optional[go.Figure] = None
     foundation: Optional[Foundation] = None
     windshare: Optional[float] = None
+    windshares: Optional[dict] = None  # {combo name: windshare}
     results: Optional[dict] = None
+    M_combos: Optional[dict] = None  # {combo name: M_SecondOrder} kNm
     results_latex: Optional[dict] = None
 
 
 def calc_geom_data(sw: Shearwall) -> Shearwall:
     """
     Takes a Shearwall and returns the Shearwall with added variables 
-    'nodes', 'edges' and 'faces' as lists representing the 3d geometry of a shearwall.
+    'nodes', 'edges' and 'faces' as NumPy arrays representing the 3d geometry
+    of a shearwall, segmented per story.
 
-    'nodes' # [[x, y, z],...] nodes in x, y, z
-    'edges' # [[i, j],...] meaning node numbers
-    'faces' # [[i, j, k],...] meaning node numbers
+    'nodes' # (n, 3) array with x, y, z
+    'edges' # (n, 2) array with node numbers
+    'faces' # (n, 3) array with node numbers
 
     N.B.:
     'nodes_floor' # [[x, y],...] nodes in x, y on ground level
@@ -54,7 +67,18 @@ def calc_geom_data(sw: Shearwall) -> Shearwall:
 
     h = (sw.top_flange_height / 2 + sw.web_height + sw.bot_flange_height / 2) / 1000
 
-    if sw.aligned == 'center':
+    if sw.section_polygons is not None:
+        # Outline of every ring of a polygonal section, bottom of the section at y = 0
+        rings = [np.asarray(ring, dtype=float) / 1000 for ring in sw.section_polygons + (sw.section_openings or [])]
+        y_min = min(ring[:, 1].min() for ring in rings)
+        nodes_floor = [[x, y - y_min] for ring in rings for x, y in ring]
+        edges_floor = []
+        start = 0
+        for ring in rings:
+            idx = list(range(start, start + len(ring)))
+            edges_floor += [[i, j] for i, j in zip(idx, idx[1:] + idx[:1])]
+            start += len(ring)
+    elif sw.aligned == 'center':
         nodes_floor = [[-(sw.top_flange_width / 2) / 1000, h], [0, h], [(sw.top_flange_width / 2) / 1000, h]]
         nodes_floor += [[-(sw.bot_flange_width / 2) / 1000, 0], [0, 0], [(sw.bot_flange_width / 2) / 1000, 0]]
         edges_floor = [[0, 1], [1, 2], [3, 4], [4, 5], [1, 4]]
@@ -72,7 +96,7 @@ def calc_geom_data(sw: Shearwall) -> Shearwall:
     for node_floor in nodes_floor:
         node_floor[0] += sw.insert_point
         
-    nodes, edges, faces = expand_geom_data(nodes_floor, edges_floor, sw.height)
+    nodes, edges, faces = expand_geom_data(nodes_floor, edges_floor, sw.height, sw.no_stories)
     
     sw.nodes = nodes
     sw.edges = edges
@@ -80,35 +104,170 @@ def calc_geom_data(sw: Shearwall) -> Shearwall:
     return sw
 
 
-def calculate_section(wall: Shearwall) -> Shearwall:
+def i_section_polygons(wall: Shearwall) -> list:
     """
-    Takes a Shearwall object and calculates sectionproperties.
-    Returns the Shearwall with added variables A, Iy, h, e_top, e_bot.
+    Takes a Shearwall object and returns the polygons of its I/T section
+    (top flange, web and bottom flange) as three rectangles in mm,
+    with the bottom of the section at y = 0 and x according to 'aligned'.
     """
     layers = [
-        [wall.top_flange_width, wall.top_flange_height],
+        [wall.bot_flange_width, wall.bot_flange_height],
         [wall.web_width, wall.web_height],
-        [wall.bot_flange_width, wall.bot_flange_height]
+        [wall.top_flange_width, wall.top_flange_height],
     ]
+    polygons = []
+    y_bot = 0
+    for b, h in layers:
+        if wall.aligned == 'left':
+            x_left = 0
+        elif wall.aligned == 'center':
+            x_left = -b / 2
+        else:
+            x_left = -b
+        if b > 0 and h > 0:
+            polygons.append([[x_left, y_bot], [x_left + b, y_bot], [x_left + b, y_bot + h], [x_left, y_bot + h]])
+        y_bot += h
+    return polygons
 
-    df = pd.DataFrame(layers, columns=["b", "h"])
-    df['A'] = df['b'] * df['h']
-    df['Iy_eigen'] = 1/12 * df['b'] * df['h']**3
-    df['center_top'] = df['h'].cumsum() - df['h'] / 2
-    df['S'] = df['A'] * df['center_top']
 
-    e_top = df['S'].sum() / df['A'].sum()
-    e_bot = df['h'].sum() - e_top
+def section_polygons(wall: Shearwall) -> Tuple[list, list]:
+    """
+    Takes a Shearwall object and returns its section as (polygons, openings).
+    Walls without 'section_polygons' are converted from their I/T section inputs.
+    """
+    if wall.section_polygons is None:
+        return (i_section_polygons(wall), [])
+    return (wall.section_polygons, wall.section_openings or [])
 
-    df['zwp_center_el'] = e_top - df['center_top']
-    df['Aaa'] = df['A'] * df['zwp_center_el']**2
-    
-    wall.A = df['A'].sum()
-    wall.Iy = df['Iy_eigen'].sum() + df['Aaa'].sum()
-    wall.h = df['h'].sum() 
-    wall.e_top = e_top
-    wall.e_bot = e_bot
-    return wall
+
+def section_properties(sections: Sequence[Tuple[Sequence, Sequence]]) -> Dict[str, np.ndarray]:
+    """
+    Calculates the section properties of many polygonal sections at once
+    with Green's theorem. Every section is a tuple (polygons, openings) of
+    rings [[x, y], ...] in mm; the orientation of the rings does not matter.
+    Solid polygons must not overlap, openings must lie within the polygons.
+    Raises a ValueError if a section has no polygon or a ring has less than
+    3 vertices.
+
+    Returns a dict of arrays with one value per section:
+
+    'A'             # area
+    'x_c', 'y_c'    # centroid
+    'Iy', 'Iz'      # second moments about the horizontal and vertical centroidal axes
+    'Iyz'           # product moment about the centroidal axes
+    'I1', 'I2'      # principal second moments (I1 >= I2)
+    'alpha'         # angle (rad) between the horizontal axis and the I1 axis
+    'x_min', 'x_max', 'y_min', 'y_max'   # bounding box
+    """
+    rings = []
+    ring_sign = []
+    ring_section = []
+    for idx, (polygons, openings) in enumerate(sections):
+        if not len(polygons):
+            raise ValueError(f"Section {idx} has no polygons")
+        for sign, section_rings in ((1.0, polygons), (-1.0, openings or [])):
+            for ring in section_rings:
+                ring = np.asarray(ring, dtype=float).reshape(-1, 2)
+                if len(ring) < 3:
+                    raise ValueError(f"Section {idx} has a ring with {len(ring)} vertices, at least 3 are needed")
+                rings.append(ring)
+                ring_sign.append(sign)
+                ring_section.append(idx)
+    n_sections = len(sections)
+    n_rings = len(rings)
+    ring_lengths = np.array([len(ring) for ring in rings], dtype=int)
+    ring_section = np.array(ring_section, dtype=int)
+
+    xy = np.concatenate(rings)
+    vertex_ring = np.repeat(np.arange(n_rings), ring_lengths)
+    vertex_section = ring_section[vertex_ring]
+
+    # Bounding box per section (vertices are grouped per section)
+    section_starts = np.searchsorted(vertex_section, np.arange(n_sections))
+    x_min = np.minimum.reduceat(xy[:, 0], section_starts)
+    x_max = np.maximum.reduceat(xy[:, 0], section_starts)
+    y_min = np.minimum.reduceat(xy[:, 1], section_starts)
+    y_max = np.maximum.reduceat(xy[:, 1], section_starts)
+
+    # Work relative to the bounding box center of each section for accuracy
+    x_ref = (x_min + x_max) / 2
+    y_ref = (y_min + y_max) / 2
+    x0 = xy[:, 0] - x_ref[vertex_section]
+    y0 = xy[:, 1] - y_ref[vertex_section]
+
+    # Next vertex of every vertex within its ring
+    ring_starts = np.concatenate([[0], np.cumsum(ring_lengths)[:-1]])
+    next_idx = np.arange(len(xy)) + 1
+    next_idx[ring_starts + ring_lengths - 1] = ring_starts
+    x1 = x0[next_idx]
+    y1 = y0[next_idx]
+
+    # Orient every ring: solids counterclockwise, openings clockwise
+    cross = x0 * y1 - x1 * y0
+    ring_area = np.bincount(vertex_ring, weights=cross, minlength=n_rings)
+    cross *= (np.array(ring_sign) * np.sign(ring_area))[vertex_ring]
+
+    def integrate(values: np.ndarray) -> np.ndarray:
+        return np.bincount(vertex_section, weights=values * cross, minlength=n_sections)
+
+    A = integrate(np.ones_like(cross)) / 2
+    S_x = integrate(x0 + x1) / 6  # integral of x dA
+    S_y = integrate(y0 + y1) / 6  # integral of y dA
+    I_xx = integrate(y0**2 + y0 * y1 + y1**2) / 12  # integral of y2 dA
+    I_yy = integrate(x0**2 + x0 * x1 + x1**2) / 12  # integral of x2 dA
+    I_xy = integrate(x0 * y1 + 2 * x0 * y0 + 2 * x1 * y1 + x1 * y0) / 24  # integral of xy dA
+
+    dx = S_x / A
+    dy = S_y / A
+    Iy = I_xx - A * dy**2
+    Iz = I_yy - A * dx**2
+    Iyz = I_xy - A * dx * dy
+
+    I_avg = (Iy + Iz) / 2
+    I_rad = np.hypot((Iy - Iz) / 2, Iyz)
+    return {
+        'A': A,
+        'x_c': x_ref + dx,
+        'y_c': y_ref + dy,
+        'Iy': Iy,
+        'Iz': Iz,
+        'Iyz': Iyz,
+        'I1': I_avg + I_rad,
+        'I2': I_avg - I_rad,
+        'alpha': 0.5 * np.arctan2(-2 * Iyz, Iy - Iz),
+        'x_min': x_min,
+        'x_max': x_max,
+        'y_min': y_min,
+        'y_max': y_max,
+    }
+
+
+def calculate_sections(walls: Sequence[Shearwall]) -> list[Shearwall]:
+    """
+    Takes Shearwall objects and calculates their sectionproperties in one batch.
+    Returns the Shearwalls with added variables A, Iy, Iz, Iyz, I1, I2, alpha, h, e_top, e_bot.
+    """
+    props = section_properties([section_polygons(wall) for wall in walls])
+    for idx, wall in enumerate(walls):
+        wall.A = float(props['A'][idx])
+        wall.Iy = float(props['Iy'][idx])
+        wall.Iz = float(props['Iz'][idx])
+        wall.Iyz = float(props['Iyz'][idx])
+        wall.I1 = float(props['I1'][idx])
+        wall.I2 = float(props['I2'][idx])
+        wall.alpha = float(props['alpha'][idx])
+        wall.h = float(props['y_max'][idx] - props['y_min'][idx])
+        wall.e_top = float(props['y_max'][idx] - props['y_c'][idx])
+        wall.e_bot = float(props['y_c'][idx] - props['y_min'][idx])
+    return list(walls)
+
+
+def calculate_section(wall: Shearwall) -> Shearwall:
+    """
+    Takes a Shearwall object and calculates sectionproperties.
+    Returns the Shearwall with added variables A, Iy, Iz, Iyz, I1, I2, alpha, h, e_top, e_bot.
+    """
+    return calculate_sections([wall])[0]
 
 
 def plot_section(wall: Shearwall) -> Shearwall:
@@ -116,45 +275,21 @@ def plot_section(wall: Shearwall) -> Shearwall:
     Takes a Shearwall object and plots the section of the shearwall.
     Returns the Shearwall with added "plot_section" variable.
     """
-    go.Figure()
     fig = go.Figure()
-    tf_w = wall.top_flange_width
-    tf_h = wall.top_flange_height
-    web_w = wall.web_width
-    bf_w = wall.bot_flange_width
-    bf_h = wall.bot_flange_height
-
-    e_top = wall.e_top
-    e_bot = wall.e_bot
-
-    if wall.aligned == 'left':
-        tf_x = [0, tf_w, tf_w, 0]
-        web_x = [0, web_w, web_w, 0]
-        bf_x = [0, bf_w, bf_w, 0]
-    elif wall.aligned == 'center':
-        tf_x = [-tf_w / 2, tf_w / 2, tf_w / 2, -tf_w / 2]
-        web_x = [-web_w / 2, web_w / 2, web_w / 2, -web_w / 2]
-        bf_x = [-bf_w / 2, bf_w / 2, bf_w / 2, -bf_w / 2]
-    else:
-        tf_x = [-bf_w, 0, 0, -bf_w]
-        web_x = [-web_w, 0, 0, -web_w]
-        bf_x = [-bf_w, 0, 0, -bf_w]
-
-    tf = {'x': tf_x, 'y': [e_top, e_top, e_top - tf_h, e_top - tf_h]}
-    web = {'x': web_x, 'y': [-e_bot + bf_h, -e_bot + bf_h, e_top - tf_h, e_top - tf_h]}
-    bf = {'x': bf_x, 'y': [-e_bot, -e_bot, -e_bot + bf_h, -e_bot + bf_h]}
-
-    items = [tf, web, bf]
-
-    for item in items:
-        fig.add_trace(go.Scatter(
-            x=item['x'],
-            y=item['y'],
-            fill="toself",
-            fillcolor='royalblue',
-            line_color='royalblue',
+    polygons, openings = section_polygons(wall)
+    y_c = wall.e_bot + min(y for ring in polygons for _, y in ring)
+
+    for rings, color in ((polygons, 'royalblue'), (openings, 'white')):
+        for ring in rings:
+            ring = np.asarray(ring, dtype=float)
+            fig.add_trace(go.Scatter(
+                x=ring[:, 0],
+                y=ring[:, 1] - y_c,
+                fill="toself",
+                fillcolor=color,
+                line_color='royalblue',
+                )
             )
-        )
 
     fig.update_yaxes(
         scaleanchor="x",
@@ -169,4 +304,4 @@ def plot_section(wall: Shearwall) -> Shearwall:
     )
 
     wall.plot_section = fig
-    return wall
\ No newline at end of file
+    return wall
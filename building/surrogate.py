@@ -0,0 +1,263 @@
+"""
+A module with a precomputed surrogate for the windshares of the shearwalls.
+
+For a given amount of walls the windshare of every wall only depends on the
+normalized insert points u = insert_point / width. The surrogate is a grid
+over u (every wall an axis) of the support moments of the windbeam (of a unit
+UDL on a unit width), built offline with the exact windbeam solver and stored
+as .npy files which are memory-mapped on use. Moments in between are
+interpolated multilinearly and the windshares follow exactly from statics.
+The moments are smooth where the reactions are not: walls close together get
+large opposite reactions (they act as a clamped support).
+
+Per grid cell the largest windshare error found at sampled points is stored
+as error bound; estimates outside the grid or with a bound above the
+tolerance fall back to the exact solve.
+
+The grids are not shipped and are not built on a server start: build them
+offline, once per host, into SURROGATE_DIR (outside the package, set by the
+environment variable SHEARWALL_SURROGATE_DIR). Without a grid windshares()
+solves exactly.
+
+Usage:
+    python -m building.surrogate --walls 1 2 3 4
+"""
+import argparse
+import functools
+import itertools
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+import numpy as np
+from scipy.ndimage import maximum_filter
+from building.windbeam import windbeam_model
+
+SURROGATE_DIR = Path(os.environ.get('SHEARWALL_SURROGATE_DIR', Path.home() / '.cache' / 'shearwall' / 'surrogates'))
+GRID_POINTS = {1: 2, 2: 101, 3: 51, 4: 31}  # default grid points per axis
+TOLERANCE = 0.005  # windshare (fraction of the windload)
+ERROR_SAFETY = 2.0  # factor on the largest sampled error of a cell
+
+
+@dataclass
+class WindshareSurrogate:
+    """
+    Represents the windshare grid of a building with no_walls shearwalls.
+    """
+    no_walls: int
+    moments: np.ndarray  # (points,) * no_walls + (no_walls,) support moment per grid point
+    errors: np.ndarray  # (points - 1,) * no_walls error bound per grid cell
+
+
+def exact_windshares(u: np.ndarray) -> np.ndarray:
+    """
+    Function calculates the windshares of walls at the normalized insert points
+    u (m, no_walls) with the exact windbeam solver. Returns an array (m, no_walls).
+    """
+    return exact_solve(u)[0]
+
+
+def exact_solve(u: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Function solves the windbeams of a unit UDL on a unit width with walls at
+    the normalized insert points u (m, no_walls).
+    Returns a tuple (windshares, support moments), both (m, no_walls).
+    """
+    u = np.atleast_2d(u)
+    shares = np.empty(u.shape)
+    moments = np.zeros(u.shape)
+    for idx, points in enumerate(u):
+        model = windbeam_model(points, 0.0, 1.0, [1.0], n_points=2)
+        shares[idx] = model.reactions[0]
+        if model.M_sup is not None:
+            moments[idx] = model.M_sup[model.sup_idx]
+    return (shares, moments)
+
+
+def statics_windshares(u: np.ndarray, moments: np.ndarray) -> np.ndarray:
+    """
+    Function calculates the windshares (support reactions of a unit UDL on a
+    unit width) from the support moments of walls at the normalized insert
+    points u, both (m, no_walls). Coincident walls give NaN.
+    """
+    order = np.argsort(u, axis=1)
+    x = np.take_along_axis(u, order, axis=1)
+    M = np.take_along_axis(moments, order, axis=1)
+    if u.shape[1] == 1:
+        return np.ones(u.shape)
+    L = np.diff(x, axis=1)
+    R = np.zeros(x.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dM = np.diff(M, axis=1) / L
+        R[:, :-1] += L / 2 + dM
+        R[:, 1:] += L / 2 - dM
+    R[:, 0] += x[:, 0]
+    R[:, -1] += 1 - x[:, -1]
+    shares = np.empty(u.shape)
+    np.put_along_axis(shares, order, R, axis=1)
+    return shares
+
+
+def build_surrogate(no_walls: int, points: Optional[int] = None, directory: Path = SURROGATE_DIR,
+                    samples: int = 8, seed: int = 0) -> WindshareSurrogate:
+    """
+    Function builds the surrogate of no_walls walls on a grid of points per axis
+    and saves it in directory. Only sorted grid points and cells are solved; the
+    others follow by permuting the walls. The error bound of a cell is
+    ERROR_SAFETY times the largest interpolation error at the centre and at
+    random sample points of the cell and its neighbouring cells.
+    Returns the WindshareSurrogate.
+    """
+    points = points or GRID_POINTS.get(no_walls, 11)
+    rng = np.random.default_rng(seed)
+    permutations = [np.array(p) for p in itertools.permutations(range(no_walls))]
+
+    moments = np.zeros((points,) * no_walls + (no_walls,), dtype=np.float32)
+    nodes = np.array(list(itertools.combinations_with_replacement(range(points), no_walls)))
+    _, node_moments = exact_solve(nodes / (points - 1))
+    for node, moment in zip(nodes, node_moments):
+        for p in permutations:
+            moments[tuple(node[p])] = moment[p]
+    surrogate = WindshareSurrogate(no_walls, moments, np.zeros((points - 1,) * no_walls, dtype=np.float32))
+
+    cells = np.array(list(itertools.combinations_with_replacement(range(points - 1), no_walls)))
+    offsets = np.vstack([np.full((1, no_walls), 0.5), rng.random((samples, no_walls))])
+    errors = np.zeros(len(cells))
+    for offset in offsets:
+        u = (cells + offset) / (points - 1)
+        estimate, _ = interpolate(surrogate, u)
+        error = np.abs(estimate - exact_windshares(u)).max(axis=1)
+        errors = np.maximum(errors, np.where(np.isnan(error), np.inf, error))
+    for cell, error in zip(cells, errors):
+        for p in permutations:
+            surrogate.errors[tuple(cell[p])] = error
+    surrogate.errors[...] = ERROR_SAFETY * maximum_filter(surrogate.errors, size=3, mode='nearest')
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    np.save(directory / f'windshare_{no_walls}.npy', surrogate.moments)
+    np.save(directory / f'windshare_{no_walls}_error.npy', surrogate.errors)
+    _map_surrogate.cache_clear()
+    return surrogate
+
+
+def load_surrogate(no_walls: int, directory: Path = SURROGATE_DIR) -> Optional[WindshareSurrogate]:
+    """
+    Function memory-maps the surrogate of no_walls walls from directory.
+    Returns None if it was not built; a miss is not cached, so a surrogate
+    built later is found.
+    """
+    if not (Path(directory) / f'windshare_{no_walls}.npy').exists():
+        return None
+    return _map_surrogate(no_walls, Path(directory))
+
+
+@functools.lru_cache(maxsize=None)
+def _map_surrogate(no_walls: int, directory: Path) -> WindshareSurrogate:
+    return WindshareSurrogate(
+        no_walls=no_walls,
+        moments=np.load(directory / f'windshare_{no_walls}.npy', mmap_mode='r'),
+        errors=np.load(directory / f'windshare_{no_walls}_error.npy', mmap_mode='r'),
+    )
+
+
+def interpolate(surrogate: WindshareSurrogate, u: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Function interpolates the support moments multilinearly at the normalized
+    insert points u (m, no_walls), reading only the corners of the cells
+    involved, and calculates the windshares from them.
+    Returns a tuple (windshares (m, no_walls), error bounds (m,)); the error
+    bound is infinite outside the grid and for coincident walls.
+    """
+    u = np.atleast_2d(np.asarray(u, dtype=float))
+    cells = surrogate.errors.shape[0]
+    inside = np.all((u >= 0) & (u <= 1), axis=1)
+    s = np.clip(u, 0, 1) * cells
+    i0 = np.minimum(np.floor(s).astype(int), cells - 1)
+    t = s - i0
+
+    moments = np.zeros(u.shape)
+    for corner in itertools.product((0, 1), repeat=surrogate.no_walls):
+        corner = np.array(corner)
+        weight = np.prod(np.where(corner, t, 1 - t), axis=1)
+        moments += weight[:, None] * surrogate.moments[tuple((i0 + corner).T)]
+    shares = statics_windshares(u, moments)
+    valid = inside & np.all(np.isfinite(shares), axis=1)
+    errors = np.where(valid, surrogate.errors[tuple(i0.T)], np.inf)
+    return (shares, errors)
+
+
+def windshares(
+    insert_points: np.ndarray,
+    width: np.ndarray,
+    tolerance: float = TOLERANCE,
+    directory: Path = SURROGATE_DIR,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Function returns the windshares of walls at insert_points (m, no_walls) of
+    buildings of width (m,), estimated with the surrogate where its error bound
+    is within tolerance and solved exactly otherwise (or without a surrogate).
+    Returns a tuple (windshares (m, no_walls), error bounds (m,), exact (m,) bool).
+    """
+    insert_points = np.atleast_2d(np.asarray(insert_points, dtype=float))
+    u = insert_points / np.reshape(width, (-1, 1))
+    surrogate = load_surrogate(u.shape[1], Path(directory))
+    if surrogate is None:
+        shares, errors = np.zeros(u.shape), np.full(len(u), np.inf)
+    else:
+        shares, errors = interpolate(surrogate, u)
+    exact = errors > tolerance
+    if exact.any():
+        shares[exact] = exact_windshares(u[exact])
+        errors[exact] = 0.0
+    return (shares, errors, exact)
+
+
+def validate(no_walls: int, n: int = 2000, tolerance: float = TOLERANCE, directory: Path = SURROGATE_DIR,
+             seed: int = 1) -> dict:
+    """
+    Function compares windshares() to the exact solve at n random layouts.
+    Returns a dict with the fraction served by the surrogate, the largest
+    error and error bound of those, and the run times (s) of both.
+    """
+    u = np.random.default_rng(seed).random((n, no_walls))
+    start = time.perf_counter()
+    shares, errors, exact = windshares(u, np.ones(n), tolerance, directory)
+    t_surrogate = time.perf_counter() - start
+    start = time.perf_counter()
+    reference = exact_windshares(u)
+    t_exact = time.perf_counter() - start
+    served = ~exact
+    return {
+        'served': served.mean(),
+        'max_error': np.abs(shares - reference)[served].max(initial=0.0),
+        'max_bound': errors[served].max(initial=0.0),
+        't_surrogate': t_surrogate,
+        't_exact': t_exact,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the windshare surrogates.")
+    parser.add_argument('--walls', type=int, nargs='+', default=[1, 2, 3, 4])
+    parser.add_argument('--points', type=int, default=None, help="grid points per axis (default per amount of walls)")
+    parser.add_argument('--directory', default=str(SURROGATE_DIR))
+    args = parser.parse_args()
+
+    for no_walls in args.walls:
+        start = time.perf_counter()
+        surrogate = build_surrogate(no_walls, args.points, Path(args.directory))
+        errors = np.asarray(surrogate.errors)
+        size = surrogate.moments.nbytes + errors.nbytes
+        print(f"{no_walls} walls: {surrogate.moments.shape[0]} points per axis, {size / 1000:.0f} kB, "
+              f"{(errors <= TOLERANCE).mean() * 100:.1f}% of the cells within {TOLERANCE:g}, "
+              f"built in {time.perf_counter() - start:.1f} s")
+        check = validate(no_walls, directory=Path(args.directory))
+        print(f"    random layouts: {check['served'] * 100:.1f}% estimated, max error {check['max_error']:.2e} "
+              f"(bound {check['max_bound']:.2e}), {check['t_surrogate'] * 1000:.0f} ms "
+              f"vs {check['t_exact'] * 1000:.0f} ms exact")
+
+
+if __name__ == '__main__':
+    main()
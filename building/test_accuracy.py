@@ -0,0 +1,15 @@
+import pytest
+from building import accuracy
+
+
+def test_compare_windbeams():
+    beams = accuracy.compare_windbeams(accuracy.random_windbeam_cases(40, seed=1))
+    quantities = ['reactions', 'My_max', 'My_min', 'Vz_max', 'Vz_min']
+    assert set(beams['case']) == set(accuracy.EDGE_CASES)
+    assert beams[quantities].max().max() < accuracy.WINDBEAM_TOLERANCE
+    assert list(accuracy.reference_wall_shares(20.0, [8.5, 0.5, 8.5], 3.0)) == pytest.approx([0.5, 1.0, 0.5])
+
+
+def test_compare_sections():
+    sections, times = accuracy.compare_sections(accuracy.random_walls(200, seed=1))
+    assert sections[['A', 'Iy', 'h', 'e_top', 'e_bot']].max().max() < accuracy.SECTION_TOLERANCE
@@ -0,0 +1,40 @@
+from math import isclose
+from building import building_plot, shearwall
+from building.building import Building
+
+
+def test_expand_geom_data():
+    nodes_floor = [[0, 0], [10, 0], [10, 5], [0, 5]]
+    edges_floor = [[0, 1], [1, 2], [2, 3], [3, 0]]
+    nodes, edges, faces = building_plot.expand_geom_data(nodes_floor, edges_floor, 9.0, 3)
+
+    assert nodes.shape == (16, 3)
+    assert edges.shape == (4 * 4 + 3 * 4, 2)
+    assert faces.shape == (3 * 4 * 2, 3)
+    assert nodes[-1].tolist() == [0, 5, 9]
+    assert faces.max() == len(nodes) - 1
+
+
+def test_building_geom_data():
+    bd = Building(width=40, depth=15, height=20, no_stories=5, no_shearwalls=3)
+    bd.initialize_data()
+
+    # 5 stories of 4 walls and 5 slabs of 2 triangles
+    assert len(bd.faces) == 5 * 4 * 2 + 5 * 2
+    assert [len(sw.nodes) for sw in bd.shearwalls] == [24, 36, 24]
+    assert all(sw.faces.max() == len(sw.nodes) - 1 for sw in bd.shearwalls)
+
+
+def test_update_building_figure():
+    bd = Building(width=40, depth=15, height=20, no_stories=5, no_shearwalls=3)
+    bd.initialize_data()
+    bf = building_plot.update_building_figure(bd)
+    assert bf.traces_updated == 8
+    assert isclose(bf.bytes_figure, len(bf.fig.to_json()), rel_tol=0.02)
+
+    bd.shearwalls[1].insert_point = 12.0
+    shearwall.calc_geom_data(bd.shearwalls[1])
+    bf_next = building_plot.update_building_figure(bd, bf)
+    assert bf_next is bf
+    assert bf.traces_updated == 2
+    assert isclose(bf.fig.data[5].x.mean(), 12.0, abs_tol=1e-4)
@@ -1,3 +1,29 @@
 # import calculation
 # from math import isclose
 
+
+
+def test_F_kexact():
+    import numpy as np
+    from math import isclose
+    from building import calculation
+
+    E, I_y, l = 10000, 4.3e12, 20
+    EI = E * I_y / 10**9
+    assert isclose(calculation.F_kexact(E, I_y, np.inf, l), 7.8373 * EI / l**2, rel_tol=1e-4)
+    assert isclose(calculation.F_kexact(1e6 * E, I_y, 1e5, l), 2 * 1e5 / l, rel_tol=1e-4)
+
+    C_rot = np.array([1e4, 1e5, 1e6, 1e7, 1e8])
+    exact = calculation.F_kexact(E, I_y, C_rot, l)
+    dunkerley = calculation.F_ktot(calculation.F_k1(E, I_y, l), calculation.F_k2(C_rot, l))
+    assert exact.shape == (5,) and np.all(exact >= dunkerley) and np.all(exact < 1.1 * dunkerley)
+
+
+def test_cached_renderer():
+    from building import calculation
+
+    calculation.hc_F_k2.cache_clear()
+    latex, value = calculation.hc_F_k2(1.0e6, 20.0)
+    assert calculation.hc_F_k2(1.0e6, 20.0) == (latex, value)
+    assert value == calculation.F_k2(1.0e6, 20.0)
+    assert calculation.hc_F_k2.cache_info().hits == 1
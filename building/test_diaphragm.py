@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from building import diaphragm
+
+
+def test_solve_diaphragms():
+    # Walls in y at x = 0 and 40, a wall in x at y = 10; wind in y at x = 30
+    x, y, angle = [0.0, 40.0, 20.0], [5.0, 5.0, 10.0], [90.0, 90.0, 0.0]
+    loads = np.array([[[0.0, 100.0, 30.0 * 100.0], [100.0, 0.0, -5.0 * 100.0]]])
+    result = diaphragm.solve_diaphragms(x, y, angle, [1e4, 1e4, 1e4], [0.0, 0.0, 0.0], loads)
+
+    assert np.allclose(result.centre_of_rigidity[0], [20.0, 10.0])
+    # Statically determinate: the y walls take the wind in y like a beam on two supports
+    assert np.allclose(result.forces_strong[0, 0], [25.0, 75.0, 0.0])
+    assert np.allclose(diaphragm.wall_shares(result)[0, 0], [0.25, 0.75, 0.0])
+    # Wind in x at y = 5 twists the floor about the centre of rigidity
+    assert np.allclose(result.forces_strong[0, 1], [-12.5, 12.5, 100.0])
+
+    with pytest.raises(ValueError):
+        diaphragm.solve_diaphragms([0.0, 40.0], [5.0, 5.0], [90.0, 90.0], 1e4, 0.0, loads)
+
+
+def test_wall_stiffness():
+    # 1 kNm2 per MPa * 1e9 mm4, H = 10 m: flexibility H^3 / (3 EI) + H^2 / C_rot
+    assert np.isclose(diaphragm.wall_stiffness(3e4, 1e9, 10.0), 3 * 3e4 / 1000)
+    assert np.isclose(diaphragm.wall_stiffness(3e4, 1e9, 10.0, 1e4), 1 / (1000 / 9e4 + 100 / 1e4))
+    assert np.allclose(diaphragm.wall_stiffness(3e4, [1e9, 1e9], 10.0, [np.inf, 1e4]),
+                       [90.0, 1 / (1000 / 9e4 + 100 / 1e4)])
+
+
+def test_building_diaphragm_l_sections():
+    from building.report import Scenario, prepare_scenario
+
+    # Unequal leg angles: the centroidal axes are not principal (Iyz != 0)
+    l_section = [[[0, 0], [3000, 0], [3000, 300], [300, 300], [300, 5000], [0, 5000]]]
+    walls = [{'section_polygons': l_section, 'plan_angle': angle, 'plan_y': y}
+             for angle, y in ((90.0, 5.0), (90.0, 10.0), (0.0, 2.0))]
+    bd = prepare_scenario(Scenario(building={'no_shearwalls': 3}, shearwalls=walls), plot=False)
+    for sw in bd.shearwalls:
+        sw.foundation.foundation_stiffness = np.inf
+    result = diaphragm.building_diaphragm(bd)
+
+    # Translational floor stiffness from the full section tensors [[Iz, Iyz], [Iyz, Iy]],
+    # rotated from the section (web along y) to the plan (web at plan_angle)
+    K_xy = np.zeros((2, 2))
+    for sw in bd.shearwalls:
+        assert abs(sw.Iyz) > 0.1 * sw.Iz
+        phi = np.radians(sw.plan_angle - 90.0)
+        R = np.array([[np.cos(phi), -np.sin(phi)], [np.sin(phi), np.cos(phi)]])
+        J = np.array([[sw.Iz, sw.Iyz], [sw.Iyz, sw.Iy]]) * sw.E_wall / 10**9
+        K_xy += 3 / bd.height**3 * R @ J @ R.T
+    assert np.allclose(result.stiffness[0, :2, :2], K_xy)
@@ -0,0 +1,20 @@
+from building.figures import FigureManager
+
+
+def test_figure_manager_steady_state():
+    manager = FigureManager(max_bytes=50000, pool_size=1, dpi=50)
+
+    def draw(fig, idx):
+        ax = fig.subplots()
+        ax.plot([0, 1], [0, idx])
+
+    for idx in range(30):
+        manager.render(f'plot {idx}', lambda fig: draw(fig, idx))
+    manager.render('plot 29', lambda fig: draw(fig, 29))
+
+    metrics = manager.metrics()
+    assert metrics['hits'] == 1 and metrics['misses'] == 30
+    assert metrics['cache_bytes'] <= 50000
+    assert metrics['evictions'] > 0
+    assert metrics['live_figures'] <= 1
+    assert metrics['pyplot_figures'] == 0
@@ -18,3 +18,19 @@ def test_calculate_foundation():
 
 
 
+
+
+def test_pile_forces():
+    fd = foundation.Foundation(
+        pile_grid_x = 1500,
+        pile_grid_y = 1500,
+        pile_no_x = 2,
+        pile_no_y = 3,
+    )
+    coords = foundation.pile_coordinates(fd)
+    forces = foundation.pile_forces(coords, N=[600, 600], M_x=[300, -300])
+
+    assert forces.shape == (2, 6)
+    assert isclose(forces[0].sum(), 600)
+    assert isclose(forces[0].max(), 150) and isclose(forces[0].min(), 50)
+    assert isclose(forces[1][coords[:, 1] > 0].max(), 50)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from math import isclose
+from building import pdelta
+from building.shearwall import Shearwall
+
+
+def test_solve_pdelta():
+    # Fixed cantilever with a tip load P and H: w = H (tan kL - kL) / (P k), k = sqrt(P / EI)
+    EI, L, P, H = 1e6, 10.0, 2e4, 10.0
+    k = np.sqrt(P / EI)
+    result = pdelta.solve_pdelta([L / 2, L / 2], EI, [[0.0, H]], [[0.0, P]], np.inf, segments=4)
+    assert result.stable[0]
+    assert isclose(result.deflection[0, -1], H * (np.tan(k * L) - k * L) / (P * k), rel_tol=1e-4)
+    assert isclose(result.M_first[0, 0], H * L)
+    assert isclose(result.M_second[0, 0], H * L + P * result.deflection[0, -1])
+    assert isclose(result.drift.sum(), result.deflection[0, -1])
+
+    # First order on a rotational spring: w = H L^3 / (3 EI) + H L^2 / C_rot
+    result = pdelta.solve_pdelta([L], EI, [[H]], [[0.0]], 1e5, segments=1)
+    assert isclose(result.deflection_first[0, -1], H * L**3 / (3 * EI) + H * L**2 / 1e5)
+
+    # Beyond the critical load (pi^2 EI / (4 L^2)) a wall is unstable
+    result = pdelta.solve_pdelta([L], EI, [[H]], [[np.pi**2 * EI / (4 * L**2) * 1.01]], np.inf)
+    assert not result.stable[0] and np.isnan(result.M_second[0, 0])
+
+    # Without a spring (or stiffness) the wall is a mechanism
+    for C_rot, EI_wall in ((0.0, EI), (-1e5, EI), (np.inf, 0.0)):
+        with pytest.raises(ValueError):
+            pdelta.solve_pdelta([L], EI_wall, [[H]], [[0.0]], C_rot)
+
+
+def test_story_stiffness():
+    sw = Shearwall()
+    EI = pdelta.story_stiffness(sw, [None, {'web_width': 200}, {'web_width': 200, 'top_flange_width': 0}], 4)
+    assert isclose(EI[0], EI[3])
+    assert EI[0] > EI[1] > EI[2]
+    assert sw.web_width == 250
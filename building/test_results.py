@@ -0,0 +1,24 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from building import results
+from building.report import Scenario, run_scenario
+
+
+def test_results_table(tmp_path):
+    bd = run_scenario(Scenario(name='base'))
+    table = pa.concat_tables([
+        results.results_table(bd.shearwalls, Scenario='base'),
+        results.results_table(bd.shearwalls, Scenario='copy'),
+    ])
+    assert table.num_rows == 2 * len(bd.shearwalls)
+    assert table.schema.field('F_k1').type == pa.float64()
+    assert results.units(table)['M_SecondOrder'] == 'kNm'
+
+    results.write_results(table, tmp_path / 'results.parquet')
+    loaded = pq.read_table(tmp_path / 'results.parquet')
+    assert loaded.equals(table) and results.units(loaded) == results.units(table)
+
+    sw = bd.shearwalls[0]
+    display = results.format_table(results.results_table(bd.shearwalls))
+    assert display.loc['F_k1', sw.label] == f"{sw.results['F_k1']:.0f} kN"
+    assert display.loc['Windshare', sw.label] == f"{sw.results['Windshare'] * 100:.2f}%"
@@ -0,0 +1,65 @@
+from building import service
+from math import isclose
+
+
+def test_calculate_windbeams():
+    payloads = [
+        {'supports': [0.0, 50.0], 'width': 50.0, 'udls': [4.0]},
+        {'supports': [0.0, 50.0], 'width': 50.0, 'udls': [-4.0, 2.0]},
+        {'supports': [10.0, 40.0], 'width': 50.0, 'udls': [4.0]},
+    ]
+    results = service.calculate_windbeams(payloads)
+    assert all(isclose(r, 100.0) for r in results[0]['reactions'][0])
+    assert isclose(results[1]['reactions'][0][0], -100.0)
+    assert isclose(results[1]['reactions'][1][1], 50.0)
+    assert isclose(sum(results[2]['reactions'][0]), 200.0)
+    assert results == [service.calculate_windbeams([payload])[0] for payload in payloads]
+
+
+def test_malformed_payloads(monkeypatch):
+    import http.client
+    import json
+    import threading
+    import urllib.error
+    import urllib.request
+
+    def fail(payloads):
+        raise RuntimeError('calculation failed')
+
+    monkeypatch.setitem(service.ENDPOINTS, '/fail', fail)
+    server = service.make_server(port=0, workers=2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def post(path, body):
+        request = urllib.request.Request(base_url + path, data=body.encode())
+        try:
+            with urllib.request.urlopen(request) as response:
+                return (response.status, json.loads(response.read()))
+        except urllib.error.HTTPError as error:
+            return (error.code, json.loads(error.read()))
+
+    try:
+        for path, body in [
+            ('/windbeam', '{"supports": []}'),
+            ('/windbeam', '{"supports": "a"}'),
+            ('/shearwall', '{"building": {"no_shearwalls": 0}}'),
+            ('/section', '[1, 2]'),
+            ('/section', '{not json'),
+        ]:
+            status, data = post(path, body)
+            assert status == 400 and 'error' in data, (path, body, status, data)
+        for length in ('abc', '-5'):
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+            connection.putrequest('POST', '/windbeam')
+            connection.putheader('Content-Length', length)
+            connection.endheaders()
+            response = connection.getresponse()
+            assert response.status == 400 and 'error' in json.loads(response.read()), length
+            connection.close()
+        status, data = post('/fail', '{}')
+        assert status == 500 and data['error'] == 'RuntimeError: calculation failed'
+        assert post('/windbeam', '{"supports": [0.0, 50.0], "width": 50.0, "udls": [4.0]}')[0] == 200
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,12 @@
+from building import session
+
+
+def test_changed():
+    state = {}
+    model = session.get_model(state)
+    assert session.get_model(state) is model
+
+    assert session.changed(model, 'foundation 0', 100000, (2, 4))
+    assert not session.changed(model, 'foundation 0', 100000, (2, 4))
+    assert session.changed(model, 'foundation 0', 100000, (3, 4))
+    assert model.recomputed == ['foundation 0', 'foundation 0']
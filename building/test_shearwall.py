@@ -1,5 +1,6 @@
+import pytest
 from building import shearwall
-from math import isclose
+from math import isclose, pi
 
 
 def test_calculate_section():
@@ -15,4 +16,33 @@ def test_calculate_section():
     )
     sw = shearwall.calculate_section(sw)
     assert sw.Iy == 7431250000000
-    assert sw.A == 1950000
\ No newline at end of file
+    assert sw.A == 1950000
+
+
+def test_section_properties_box_and_l():
+    box = ([[[0, 0], [200, 0], [200, 100], [0, 100]]], [[[10, 10], [10, 90], [190, 90], [190, 10]]])
+    l_section = ([[[0, 0], [100, 0], [100, 10], [10, 10], [10, 100], [0, 100]]], [])
+    props = shearwall.section_properties([box, l_section])
+
+    assert isclose(props['A'][0], 200 * 100 - 180 * 80)
+    assert isclose(props['Iy'][0], (200 * 100**3 - 180 * 80**3) / 12)
+    assert isclose(props['Iz'][0], (100 * 200**3 - 80 * 180**3) / 12)
+    assert isclose(props['x_c'][0], 100) and isclose(props['y_c'][0], 50)
+
+    # Equal leg angle: principal axes at 45 degrees
+    assert isclose(props['A'][1], 1900)
+    assert isclose(props['x_c'][1], props['y_c'][1])
+    assert isclose(abs(props['alpha'][1]), pi / 4)
+    assert isclose(props['I1'][1] + props['I2'][1], props['Iy'][1] + props['Iz'][1])
+
+    # A section without polygons or with degenerate rings has no properties
+    for section in (([], []), ([[]], []), ([[[0, 0], [100, 0]]], []), (box[0], [[]])):
+        with pytest.raises(ValueError):
+            shearwall.section_properties([box, section])
+
+
+def test_calculate_section_polygon():
+    sw = shearwall.Shearwall(section_polygons=[[[0, 0], [1000, 0], [1000, 3000], [0, 3000]]])
+    sw = shearwall.calculate_section(sw)
+    assert isclose(sw.Iy, 1000 * 3000**3 / 12)
+    assert isclose(sw.e_top, 1500) and isclose(sw.h, 3000)
@@ -0,0 +1,18 @@
+import numpy as np
+from building import surrogate
+
+
+def test_windshares(tmp_path):
+    assert surrogate.load_surrogate(2, tmp_path) is None
+    surrogate.build_surrogate(2, points=21, directory=tmp_path)
+    u = np.random.default_rng(0).random((200, 2))
+    shares, errors, exact = surrogate.windshares(u * 40, np.full(200, 40.0), directory=tmp_path)
+    reference = surrogate.exact_windshares(u)
+
+    assert (~exact).sum() > 80
+    assert np.all(np.abs(shares - reference).max(axis=1) <= errors + 1e-9)
+    assert np.allclose(shares.sum(axis=1), 1)
+
+    shares, errors, exact = surrogate.windshares([[10.0, 10.0]], 40.0, directory=tmp_path)
+    assert exact[0] and np.allclose(shares, 0.5)
+
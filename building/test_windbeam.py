@@ -1,4 +1,5 @@
 from building import windbeam
+from math import isclose
 
 def test_calculate_windbeam():
     # test data
@@ -7,4 +8,40 @@ def test_calculate_windbeam():
     UDL_floor = 1.2
     x = windbeam.calculate_windbeam(supports, nodes, UDL_floor)
     
-    assert x[0][0] == 30
\ No newline at end of file
+    assert x[0][0] == 30
+
+def test_solve_windbeam_combos():
+    reactions, x, My, Vz = windbeam.solve_windbeam([10, 40], [0, 10, 40, 50], [1.2, -2.4])
+
+    assert reactions.shape == (2, 2)
+    assert isclose(reactions[0][0], 30) and isclose(reactions[1][1], -60)
+    assert isclose(My[0].max(), 75, rel_tol=1e-3)
+    assert isclose(My[0, -1], 0, abs_tol=1e-9)
+
+def test_move_support():
+    import numpy as np
+    supports = [0.0, 12.0, 25.0, 31.0, 31.0, 50.0]
+    model = windbeam.windbeam_model(supports, 0.0, 50.0, [1.2, -2.4])
+    for idx, x_new in [(2, 27.5), (1, 3.0), (0, 4.0), (5, 44.0), (2, 31.0), (3, 40.0)]:
+        supports[idx] = x_new
+        model = windbeam.update_windbeam_model(model, supports, 0.0, 50.0, [1.2, -2.4])
+        reference = windbeam.windbeam_model(supports, 0.0, 50.0, [1.2, -2.4])
+        assert np.allclose(model.reactions, reference.reactions, rtol=1e-12, atol=1e-9)
+        assert np.allclose(model.My, reference.My, rtol=1e-12, atol=1e-9)
+
+def test_floor_degenerate_load_combos():
+    import numpy as np
+    from building.building import default_load_combos, valid_load_combos
+    from building.calculation import sw_calculation
+    from building.report import Scenario, prepare_scenario
+
+    # Every row deleted: the default combinations are used
+    assert valid_load_combos({}) == default_load_combos()
+
+    # A combination without load still has windshares
+    load_combos = {**default_load_combos(), 'LC0': {'Wind': 0.0, 'Lean': 0.0}}
+    bd = prepare_scenario(Scenario(building={'load_combos': load_combos}), plot=False)
+    for sw in bd.shearwalls:
+        assert all(np.isfinite(share) for share in sw.windshares.values())
+        assert isclose(sw.windshares['LC0'], sw.windshares['LC1'])
+        sw_calculation(sw, bd)
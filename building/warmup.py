@@ -0,0 +1,147 @@
+"""
+A module for warming up a server process before its first session.
+
+The first session after a server start pays for importing the heavy modules
+(streamlit, pandas, matplotlib, Plotly, PyNite, handcalcs), for the first
+handcalcs renders and matplotlib draws and for empty caches. warm_up() pays
+for them at server start instead: it preloads the modules, renders every
+handcalcs template once and runs the app once with its default inputs, which
+fills the caches shared by all sessions (rendered handcalculations, windbeam
+plots).
+
+Usage:
+    python -m building.warmup app.py [streamlit options]    warm up, then serve the app
+    python -m building.warmup app.py --benchmark --runs 3   time-to-first-render, cold vs warm
+"""
+import argparse
+import importlib
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+PRELOAD_MODULES = (
+    'numpy', 'pandas', 'scipy.linalg', 'scipy.special', 'pyarrow', 'pyarrow.parquet',
+    'matplotlib', 'matplotlib.figure', 'matplotlib.backends.backend_agg', 'plotly.graph_objects',
+    'PyNite', 'handcalcs.decorator', 'streamlit',
+    'building.calculation', 'building.windbeam', 'building.building_plot', 'building.report',
+    'building.results', 'building.session',
+)
+
+
+def preload_modules(modules: tuple = PRELOAD_MODULES) -> None:
+    """
+    Imports the modules, so sessions find them in sys.modules.
+    """
+    for module in modules:
+        importlib.import_module(module)
+    return
+
+
+def render_templates() -> None:
+    """
+    Renders every handcalcs template (and draws the windbeam plots) once for
+    the default scenario, which builds the parsers of handcalcs and the font
+    cache of matplotlib.
+    """
+    from building import calculation
+    from building.report import Scenario, prepare_scenario
+
+    bd = prepare_scenario(Scenario(name='warm-up'))
+    for sw in bd.shearwalls:
+        calculation.sw_calculation(sw, bd)
+    return
+
+
+def run_app(app_path: str, timeout: float = 120) -> None:
+    """
+    Runs the app script once with its default inputs (headless), filling the
+    caches for the default inputs.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(Path(app_path).resolve()), default_timeout=timeout).run()
+    if at.exception:
+        raise RuntimeError(f"Warm-up run of {app_path} failed: {at.exception[0].value}")
+    return
+
+
+def warm_up(app_path: Optional[str] = None) -> dict:
+    """
+    Warms up the process: preloads the modules, renders the handcalcs
+    templates and runs the app (if given) with its default inputs.
+    Returns the duration (s) of every stage.
+    """
+    timings = {}
+    stages = [('preload', preload_modules), ('templates', render_templates)]
+    if app_path is not None:
+        stages.append(('app', lambda: run_app(app_path)))
+    for name, stage in stages:
+        start = time.perf_counter()
+        stage()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def first_render(app_path: str, warm: bool) -> dict:
+    """
+    Measures in this (fresh) process the time to the first render of the
+    app, after a warm-up if warm. Returns the durations (s) of the warm-up
+    stages and 'first_render'.
+    """
+    timings = warm_up(app_path) if warm else {}
+    start = time.perf_counter()
+    run_app(app_path)
+    timings['first_render'] = time.perf_counter() - start
+    return timings
+
+
+def benchmark(app_path: str, runs: int = 3) -> dict:
+    """
+    Measures the time to the first render of the app in fresh processes,
+    cold and after warm-up. Returns per mode the median durations (s).
+    """
+    report = {}
+    for mode in ('cold', 'warm'):
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-m', 'building.warmup', str(app_path), '--child', mode],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        report[mode] = {name: statistics.median(sample[name] for sample in samples) for name in samples[0]}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm up the process, then serve the app with streamlit.")
+    parser.add_argument('app', nargs='?', default=str(Path(__file__).parents[1] / 'app.py'))
+    parser.add_argument('--benchmark', action='store_true', help="measure time-to-first-render, cold vs warm")
+    parser.add_argument('--runs', type=int, default=3, help="fresh processes per benchmark mode")
+    parser.add_argument('--child', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+    args, streamlit_args = parser.parse_known_args()
+
+    if args.child:
+        print(json.dumps(first_render(args.app, args.child == 'warm')))
+        return
+    if args.benchmark:
+        report = benchmark(args.app, args.runs)
+        for mode, timings in report.items():
+            stages = ', '.join(f'{name} {seconds:.2f} s' for name, seconds in timings.items())
+            print(f"{mode:<5} {stages}")
+        print(f"first render {report['cold']['first_render'] / report['warm']['first_render']:.0f}x faster after warm-up")
+        return
+
+    timings = warm_up(args.app)
+    print("warm-up: " + ', '.join(f'{name} {seconds:.2f} s' for name, seconds in timings.items()))
+    from streamlit.web import cli
+    sys.argv = ['streamlit', 'run', args.app, *streamlit_args]
+    sys.exit(cli.main())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,36 @@
 import streamlit as st
+import numpy as np
 import matplotlib
-import matplotlib.pyplot as plt
+import matplotlib.axes
 import matplotlib.markers as markers
-from typing import Dict, Tuple
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 from PyNite import FEModel3D
+from scipy.linalg import solveh_banded
 from building.building import Building
+from building.figures import figure_key, figure_manager
 
 
-def floor(bd: Building) -> Building:
+THETA_LEAN = 1 / 400
+
+
+def floor(bd: Building, plot: bool = True) -> Building:
     """
-    Function takes a Building object calculates the windbeam and plots the results. 
+    Function takes a Building object, calculates the windbeam for all load
+    combinations of bd.load_combos in one solve and plots the results
+    (unless plot is False).
     Returns Building with add variables: 
 
-    'floor_reactions'   : dict with Support reaction forces for each shearwall
-    'floor_data_My'     : list with My data
-    'floor_data_Vz'     : list with Vz data
-    'floor_plot_My'     : plot of My as matplotlib fig
-    'floor_plot_Vz'     : plot of Vz as matplotlib fig
+    'floor_model'           : solved WindbeamModel, updated incrementally when a single shearwall moved
+    'floor_reactions'       : dict with Support reaction forces for each shearwall (first combination)
+    'floor_combo_reactions' : array (n_combos, n_shearwalls) with the reactions of every combination
+    'floor_envelope'        : dict with the envelope (max/min My, Vz and reactions per shearwall)
+    'floor_data_My'         : list with x, max My and min My data
+    'floor_data_Vz'         : list with x, max Vz and min Vz data
+    'floor_plot_My'         : plot of My as PNG image
+    'floor_plot_Vz'         : plot of Vz as PNG image
+
+    and the 'windshare' (first combination) and 'windshares' of every shearwall.
     """
     supports = {}
     for idx, sw in enumerate(bd.shearwalls):
@@ -30,21 +44,312 @@ def floor(bd: Building) -> Building:
         nodes.append(length)
     nodes = sorted(nodes)
 
-    UDL_floor = bd.pd_wind * (bd.height / bd.no_stories) # kN/m1
+    combo_names = list(bd.load_combos)
+    UDL_combos = combo_udls(bd)
 
-    support_reactions, data_My, data_Vz = calculate_windbeam(supports, nodes, UDL_floor)
-    fig_M, fig_V = plot_MV_results(data_My, data_Vz, nodes, supports)
+    bd.floor_model = update_windbeam_model(bd.floor_model, list(supports.values()), 0.0, length, UDL_combos)
+    reactions, x, My, Vz = bd.floor_model.reactions, bd.floor_model.x, bd.floor_model.My, bd.floor_model.Vz
+    envelope = windbeam_envelope(combo_names, reactions, My, Vz)
+    data_My = [x, envelope['My_line_max'], envelope['My_line_min']]
+    data_Vz = [x, envelope['Vz_line_max'], envelope['Vz_line_min']]
+    png_M, png_V = plot_MV_results(data_My, data_Vz, nodes, supports) if plot else (None, None)
 
-    bd.floor_reactions = support_reactions
+    bd.floor_reactions = {idx: float(reaction) for idx, reaction in enumerate(reactions[0])}
+    bd.floor_combo_reactions = reactions
+    bd.floor_envelope = envelope
     bd.floor_data_My = data_My
     bd.floor_data_Vz = data_Vz
-    bd.floor_plot_My = fig_M
-    bd.floor_plot_Vz = fig_V
+    bd.floor_plot_My = png_M
+    bd.floor_plot_Vz = png_V
+    # The shares follow from the reactions of a unit UDL, also for combinations without load
+    shares = bd.floor_model.R_unit / bd.width
     for idx, sw in enumerate(bd.shearwalls):
-        sw.windshare = support_reactions[idx] / bd.width / UDL_floor
+        sw.windshares = {combo: float(shares[idx]) for combo in combo_names}
+        sw.windshare = sw.windshares[combo_names[0]]
 
     return bd
 
+
+def load_case_udls(bd: Building) -> dict[str, float]:
+    """
+    Function calculates the UDL (kN/m1) on the windbeam of every load case:
+
+    'Wind'  : windload of one story
+    'Lean'  : load due to the lean of the building weight of one story
+    """
+    UDL_cases = {
+        'Wind': bd.pd_wind * (bd.height / bd.no_stories),
+        'Lean': THETA_LEAN * bd.N_vd / bd.no_stories / bd.width,
+    }
+    return UDL_cases
+
+
+def combo_udls(bd: Building) -> np.ndarray:
+    """
+    Function calculates the UDL (kN/m1) on the windbeam of every load combination
+    in bd.load_combos. Returns an array (n_combos,).
+    """
+    UDL_cases = load_case_udls(bd)
+    factors = np.array([
+        [bd.load_combos[combo].get(case, 0.0) for case in UDL_cases]
+        for combo in bd.load_combos
+    ], dtype=float).reshape(-1, len(UDL_cases))
+    return factors @ np.array(list(UDL_cases.values()))
+
+
+@dataclass
+class WindbeamModel:
+    """
+    Represents a windbeam solved with the three-moment equation: a continuous
+    beam from x_start to x_end on the supports, with a UDL per load combination.
+    Every row of the (tridiagonal) system only depends on the two spans next
+    to its support, so a moved support only updates the rows around it.
+    """
+    supports: np.ndarray  # (n_supports,) m, support position per shearwall
+    x_start: float  # m
+    x_end: float  # m
+    UDL_combos: np.ndarray  # (n_combos,) kN/m1
+    n_points: int = 1000
+    x_sup: Optional[np.ndarray] = None  # (n_unique,) m, sorted unique support positions
+    sup_idx: Optional[np.ndarray] = None  # (n_supports,) unique position of every support
+    sup_count: Optional[np.ndarray] = None  # (n_unique,) supports at every unique position
+    spans: Optional[np.ndarray] = None  # (n_unique - 1,) m, spans between the unique supports
+    bands: Optional[np.ndarray] = None  # (2, n_unique - 2) upper banded form of the system
+    rhs: Optional[np.ndarray] = None  # (n_unique - 2,) right-hand side of a unit UDL
+    M_sup: Optional[np.ndarray] = None  # (n_unique,) kNm, support moments of a unit UDL
+    R_unit: Optional[np.ndarray] = None  # (n_supports,) kN, reactions of a unit UDL
+    reactions: Optional[np.ndarray] = None  # (n_combos, n_supports) kN
+    x: Optional[np.ndarray] = None  # (n_points,) m
+    My: Optional[np.ndarray] = None  # (n_combos, n_points) kNm
+    Vz: Optional[np.ndarray] = None  # (n_combos, n_points) kN
+
+
+def solve_windbeam(
+    supports: list[float],
+    nodes: list[float],
+    UDL_combos: np.ndarray,
+    n_points: int = 1000,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Function calculates the forces on a windbeam (floorlevel) for many load
+    combinations at once. The beam spans nodes[0] to nodes[-1] with pinned
+    supports (a single support is fixed) and a UDL per combination.
+    Coincident supports share their reaction equally.
+    Returns a tuple containing:
+
+    - reactions : array (n_combos, n_supports) with support reactions
+    - x         : array (n_points,) with x positions
+    - My        : array (n_combos, n_points) with My data
+    - Vz        : array (n_combos, n_points) with Vz data
+    """
+    model = windbeam_model(supports, min(nodes), max(nodes), UDL_combos, n_points)
+    return (model.reactions, model.x, model.My, model.Vz)
+
+
+def windbeam_model(
+    supports: list[float],
+    x_start: float,
+    x_end: float,
+    UDL_combos: np.ndarray,
+    n_points: int = 1000,
+    ) -> WindbeamModel:
+    """
+    Function assembles and solves the WindbeamModel of a beam from x_start
+    to x_end on the supports. Returns the solved WindbeamModel.
+    """
+    model = WindbeamModel(
+        supports=np.array(supports, dtype=float),
+        x_start=float(x_start),
+        x_end=float(x_end),
+        UDL_combos=np.atleast_1d(np.asarray(UDL_combos, dtype=float)),
+        n_points=n_points,
+    )
+    model.x_sup, model.sup_idx, model.sup_count = np.unique(
+        model.supports, return_inverse=True, return_counts=True
+    )
+    model.spans = np.diff(model.x_sup)
+    n_rows = max(len(model.x_sup) - 2, 0)
+    model.bands = np.zeros((2, n_rows))
+    model.rhs = np.zeros(n_rows)
+    three_moment_rows(model, np.arange(n_rows))
+    return solve_model(model)
+
+
+def move_support(model: WindbeamModel, idx: int, x_new: float) -> WindbeamModel:
+    """
+    Function moves support idx of a solved WindbeamModel to x_new and solves
+    it again, updating only the spans and rows of the system next to the
+    support. When the move changes the order of the supports or joins or
+    splits coincident supports, the model is assembled anew.
+    Returns the solved WindbeamModel.
+    """
+    j = model.sup_idx[idx]
+    x_new = float(x_new)
+    lower = model.x_sup[j - 1] if j > 0 else -np.inf
+    upper = model.x_sup[j + 1] if j + 1 < len(model.x_sup) else np.inf
+    if model.sup_count[j] > 1 or not lower < x_new < upper:
+        supports = model.supports.copy()
+        supports[idx] = x_new
+        return windbeam_model(supports, model.x_start, model.x_end, model.UDL_combos, model.n_points)
+
+    model.supports[idx] = x_new
+    model.x_sup[j] = x_new
+    changed = [span for span in (j - 1, j) if 0 <= span < len(model.spans)]
+    model.spans[changed] = model.x_sup[np.array(changed) + 1] - model.x_sup[changed]
+    rows = np.arange(j - 2, j + 1)
+    three_moment_rows(model, rows[(rows >= 0) & (rows < len(model.rhs))])
+    return solve_model(model)
+
+
+def update_windbeam_model(
+    model: Optional[WindbeamModel],
+    supports: list[float],
+    x_start: float,
+    x_end: float,
+    UDL_combos: np.ndarray,
+    ) -> WindbeamModel:
+    """
+    Function returns the solved WindbeamModel for the supports, reusing the
+    previous model: unchanged, or with a single moved support solved by
+    move_support. Otherwise the model is assembled anew.
+    """
+    supports = np.asarray(supports, dtype=float)
+    UDL_combos = np.atleast_1d(np.asarray(UDL_combos, dtype=float))
+    if (model is None or len(model.supports) != len(supports) or (model.x_start, model.x_end) != (x_start, x_end)
+            or not np.array_equal(model.UDL_combos, UDL_combos)):
+        return windbeam_model(supports, x_start, x_end, UDL_combos)
+    moved = np.flatnonzero(model.supports != supports)
+    if len(moved) == 0:
+        return model
+    if len(moved) == 1:
+        return move_support(model, moved[0], supports[moved[0]])
+    return windbeam_model(supports, x_start, x_end, UDL_combos)
+
+
+def three_moment_rows(model: WindbeamModel, rows: np.ndarray) -> None:
+    """
+    Function (re)assembles rows of the three-moment system of a unit UDL.
+    Row r belongs to the interior support r + 1, its unknown is the support
+    moment (sagging positive). The moments at the outer supports follow from
+    the cantilevering ends.
+    """
+    if not len(rows):
+        return
+    L_left = model.spans[rows]
+    L_right = model.spans[rows + 1]
+    model.bands[1, rows] = 2 * (L_left + L_right)
+    model.bands[0, rows] = np.where(rows > 0, L_left, 0.0)
+    M_first, M_last = end_moments(model)
+    rhs = -(L_left**3 + L_right**3) / 4
+    rhs -= np.where(rows == 0, L_left * M_first, 0.0)
+    rhs -= np.where(rows == len(model.rhs) - 1, L_right * M_last, 0.0)
+    model.rhs[rows] = rhs
+    return
+
+
+def end_moments(model: WindbeamModel) -> Tuple[float, float]:
+    """
+    Function returns the moments of a unit UDL at the first and last support
+    due to the cantilevering ends of the beam.
+    """
+    M_first = -(model.x_sup[0] - model.x_start)**2 / 2
+    M_last = -(model.x_end - model.x_sup[-1])**2 / 2
+    return (M_first, M_last)
+
+
+def solve_model(model: WindbeamModel) -> WindbeamModel:
+    """
+    Function solves the assembled three-moment system of a WindbeamModel and
+    calculates the support reactions and the internal forces of every load
+    combination. Returns the solved WindbeamModel.
+    """
+    UDL = model.UDL_combos
+    if len(model.x_sup) == 1:
+        # A single (fixed) support takes the full load
+        R_unit = np.array([model.x_end - model.x_start])
+    else:
+        M_first, M_last = end_moments(model)
+        if len(model.rhs) > 1:
+            M_inner = solveh_banded(model.bands, model.rhs)
+        else:
+            M_inner = model.rhs / model.bands[1]
+        model.M_sup = np.concatenate([[M_first], M_inner, [M_last]])
+        dM = np.diff(model.M_sup) / model.spans
+        R_unit = np.zeros(len(model.x_sup))
+        R_unit[:-1] += model.spans / 2 + dM
+        R_unit[1:] += model.spans / 2 - dM
+        R_unit[0] += model.x_sup[0] - model.x_start
+        R_unit[-1] += model.x_end - model.x_sup[-1]
+
+    reactions_sup = UDL[:, None] * R_unit[None, :]  # (n_combos, n_unique_supports)
+    model.R_unit = R_unit[model.sup_idx] / model.sup_count[model.sup_idx]
+    model.reactions = UDL[:, None] * model.R_unit[None, :]
+    model.x, model.My, model.Vz = windbeam_forces(
+        model.x_sup, reactions_sup, UDL, model.x_start, model.x_end, model.n_points
+    )
+    return model
+
+
+def windbeam_forces(
+    x_sup: np.ndarray,
+    reactions_sup: np.ndarray,
+    UDL_combos: np.ndarray,
+    x_start: float,
+    x_end: float,
+    n_points: int = 1000,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Function calculates the internal forces of a windbeam by statics from the
+    left, with cumulative sums over the sorted supports. Forces at the right
+    end are taken just inside the beam.
+    Returns a tuple (x, My, Vz).
+    """
+    x = np.linspace(x_start, x_end, n_points)
+    xi = x - x_start
+    passed = np.searchsorted(x_sup, x, side='right')  # supports left of (or at) every point
+    passed[-1] = np.searchsorted(x_sup, x[-1], side='left')
+    zeros = np.zeros((len(UDL_combos), 1))
+    R_cum = np.hstack([zeros, np.cumsum(reactions_sup, axis=1)])
+    RX_cum = np.hstack([zeros, np.cumsum(reactions_sup * x_sup[None, :], axis=1)])
+
+    # Moment of a fixed single support (zero for more supports)
+    M_fixed = UDL_combos * (x_end - x_start)**2 / 2 - reactions_sup @ (x_end - x_sup)
+    Vz = R_cum[:, passed] - UDL_combos[:, None] * xi[None, :]
+    My = (x[None, :] * R_cum[:, passed] - RX_cum[:, passed] - UDL_combos[:, None] * xi[None, :]**2 / 2
+          + M_fixed[:, None] * (passed > 0)[None, :])
+    return (x, My, Vz)
+
+
+def windbeam_envelope(
+    combo_names: list[str],
+    reactions: np.ndarray,
+    My: np.ndarray,
+    Vz: np.ndarray,
+    ) -> dict:
+    """
+    Function calculates the envelope over all load combinations of a windbeam.
+    Returns a dict with the extremes of My and Vz (with their combination),
+    the max/min reactions per shearwall and the max/min My and Vz lines.
+    """
+    envelope = {
+        'My_max': float(My.max()),
+        'My_max_combo': combo_names[int(My.max(axis=1).argmax())],
+        'My_min': float(My.min()),
+        'My_min_combo': combo_names[int(My.min(axis=1).argmin())],
+        'Vz_max': float(Vz.max()),
+        'Vz_max_combo': combo_names[int(Vz.max(axis=1).argmax())],
+        'Vz_min': float(Vz.min()),
+        'Vz_min_combo': combo_names[int(Vz.min(axis=1).argmin())],
+        'reactions_max': reactions.max(axis=0),
+        'reactions_min': reactions.min(axis=0),
+        'My_line_max': My.max(axis=0),
+        'My_line_min': My.min(axis=0),
+        'Vz_line_max': Vz.max(axis=0),
+        'Vz_line_min': Vz.min(axis=0),
+    }
+    return envelope
+
+
 @st.cache_data
 def calculate_windbeam(
     supports: dict[int, float], 
@@ -126,18 +431,17 @@ def calculate_windbeam(
     return (support_reactions, data_My, data_Vz)
 
 
-# Nocache
 def plot_MV_results(
         data_My,
         data_Vz,
         nodes, 
         supports
-    ) -> Tuple[matplotlib.figure.Figure]:
+    ) -> Tuple[bytes, bytes]:
     
     """
     Function plots the forces on a windbeam (floorlevel).
-    Returns the Figure objects of the bendingmoments and shearforces.
-    
+    Returns the PNG images of the bendingmoments and shearforces, rendered
+    (and cached) by the figure manager.
     """
     plot_M = {
         'title': "Bending moment",
@@ -153,34 +457,38 @@ def plot_MV_results(
         'min': 'orange',
         'selected_pos': 'red'
     }
-    fig_M, ax_M = plot_results(plot_M, data_My, nodes, supports)
-    fig_M.set_size_inches(7,5)
-    
-    fig_V, ax_V = plot_results(plot_V, data_Vz, nodes, supports)
-    fig_V.set_size_inches(7,5)
-    return (fig_M, fig_V)
+    pngs = []
+    for plot_info, data in ((plot_M, data_My), (plot_V, data_Vz)):
+        data = [np.asarray(line, dtype=float) for line in data]
+        key = figure_key(plot_info, nodes, supports, *data)
+        pngs.append(figure_manager.render(
+            key,
+            lambda fig, plot_info=plot_info, data=data: plot_results(fig.subplots(), plot_info, data, nodes, supports),
+            size_inches=(7, 5),
+        ))
+    return tuple(pngs)
 
 
-@st.cache_data
 def plot_results(
+    ax: matplotlib.axes.Axes,
     plot_info: Dict[str,str], 
     data: list[list[int]], 
     nodes: list[int],
-    supports: list[int],
-) -> Tuple[matplotlib.figure.Figure, matplotlib.axes._axes.Axes]:
+    supports: dict[int, float],
+) -> matplotlib.axes.Axes:
     """
-    Plots the data and returns a Matplotlib Figure and Axes object.
+    Plots the data on a Matplotlib Axes object and returns it.
     """
-    fig, ax = plt.subplots()
     ax.set_title(plot_info['title'])
     ax.set_xlabel("m")
     ax.set_ylabel(plot_info['y_label'])
     ax.plot(data[0], data[1], plot_info['max'])
     
     ax.fill_between(data[0], data[1], color=plot_info['max'], alpha=0.3)
+    if len(data) > 2:
+        ax.plot(data[0], data[2], plot_info['min'])
+        ax.fill_between(data[0], data[2], color=plot_info['min'], alpha=0.3)
     ax.plot([0,nodes[-1]],[0,0], color='gray', linewidth=3)
     for support in supports:
         ax.plot(supports[support], 0, marker=markers.CARETUP, color='gray', markersize=9)
-    return fig, ax
-
-
+    return ax